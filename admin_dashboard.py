@@ -16,6 +16,7 @@ from sqlalchemy import func
 from database import SessionLocal, get_db
 from auth import PasswordAuth, SessionManager
 from audit import AuditLogger, AuditActions, get_audit_summary
+from api_key_cache import api_key_cache
 
 
 def check_admin_access(user: User) -> bool:
@@ -430,6 +431,7 @@ def render_api_keys_tab(db: Session, user: User):
                             description=f"Revoked API key: {selected_key.name}"
                         )
                         db.commit()
+                        api_key_cache.publish_invalidation(selected_key.id)
                         st.success("API key revoked")
                         st.rerun()
             
@@ -445,6 +447,7 @@ def render_api_keys_tab(db: Session, user: User):
                         description=f"Deleted API key: {selected_key.name}"
                     )
                     db.commit()
+                    api_key_cache.publish_invalidation(selected_key_id)
                     st.success("API key deleted")
                     st.rerun()
     else:
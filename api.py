@@ -11,7 +11,7 @@ from fastapi.staticfiles import StaticFiles
 from slowapi import Limiter, _rate_limit_exceeded_handler
 from slowapi.util import get_remote_address
 from slowapi.errors import RateLimitExceeded
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, load_only
 from typing import Optional, List, Dict, Any, Union
 from pydantic import BaseModel, Field, validator
 from datetime import datetime, timedelta
@@ -28,7 +28,10 @@ from models import (
     Organization, User, APIKey, AuditLog, APIUsageLog, 
     ThreatAssessment, UsageStats
 )
-from database import get_db, engine
+from database import get_db, engine, upgrade_schema
+from audit_buffer import audit_log_writer, api_usage_writer
+from rate_limiter import api_key_rate_limiter
+from api_key_cache import api_key_cache, CachedAPIKey
 from auth import SessionManager, SAMLAuthHandler, InputValidator, get_password_hash, verify_password, create_access_token
 from threat_frameworks import FRAMEWORKS, RISK_AREAS, build_comprehensive_prompt
 
@@ -203,6 +206,9 @@ class UsageStatsResponse(BaseModel):
 # Startup initialization
 @app.on_event("startup")
 async def on_startup():
+    # Existing databases (e.g. the bundled SQLite file) may predate newer model columns
+    upgrade_schema()
+    
     secret = os.getenv("JWT_SECRET_KEY")
     if not secret:
         # Check if in production environment
@@ -229,41 +235,57 @@ async def on_startup():
 async def get_current_api_key(
     api_key: str = Depends(api_key_header),
     db: Session = Depends(get_db)
-) -> APIKey:
-    """Validate API key and return the APIKey object"""
+) -> CachedAPIKey:
+    """Validate API key and return a snapshot of the APIKey row (cached for API_KEY_CACHE_TTL)"""
     if not api_key:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="API key is missing"
         )
     
-    # Hash the provided key
-    key_hash = APIKey.hash_key(api_key)
-    
-    # Find the API key in database
-    db_api_key = db.query(APIKey).filter(
-        APIKey.key_hash == key_hash,
-        APIKey.is_active == True
-    ).first()
+    # Hash the provided key (current and legacy scheme)
+    key_hashes = APIKey.candidate_hashes(api_key)
     
-    if not db_api_key:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid API key"
-        )
+    cached_key = api_key_cache.get(key_hashes[0])
+    if cached_key is None:
+        # Find the API key in database
+        db_api_key = db.query(APIKey).filter(
+            APIKey.key_hash.in_(key_hashes),
+            APIKey.is_active == True
+        ).first()
+        
+        if not db_api_key or not db_api_key.verify_key(api_key):
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Invalid API key"
+            )
+        
+        # Move legacy SHA256 keys to the current hash scheme on first use
+        db_api_key.upgrade_hash(api_key)
+        
+        # Update last used (once per cache fill, so accurate to API_KEY_CACHE_TTL)
+        db_api_key.last_used_at = datetime.utcnow()
+        db.commit()
+        
+        cached_key = CachedAPIKey.from_model(db_api_key)
+        api_key_cache.put(key_hashes[0], cached_key)
     
     # Check if expired
-    if db_api_key.expires_at and db_api_key.expires_at < datetime.utcnow():
+    if cached_key.expires_at and cached_key.expires_at < datetime.utcnow():
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="API key has expired"
         )
     
-    # Update last used
-    db_api_key.last_used_at = datetime.utcnow()
-    db.commit()
+    # Enforce the key's requests-per-minute limit (Redis sliding window when configured)
+    if not api_key_rate_limiter.allow(cached_key.id, cached_key.rate_limit):
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="API key rate limit exceeded",
+            headers={"Retry-After": "60"}
+        )
     
-    return db_api_key
+    return cached_key
 
 
 async def get_current_user(
@@ -304,8 +326,8 @@ async def log_api_usage(
     response_time_ms: int,
     db: Session
 ):
-    """Log API usage for analytics and rate limiting"""
-    usage_log = APIUsageLog(
+    """Log API usage for analytics and rate limiting (batched, written in the background)"""
+    api_usage_writer.enqueue(
         api_key_id=api_key.id,
         endpoint=str(request.url.path),
         method=request.method,
@@ -314,8 +336,6 @@ async def log_api_usage(
         ip_address=request.client.host if request.client else None,
         user_agent=request.headers.get("user-agent")
     )
-    db.add(usage_log)
-    db.commit()
 
 
 # API Endpoints
@@ -734,12 +754,6 @@ async def create_threat_assessment(
                 detail="Unable to generate threat assessment. Please try again or contact support if the issue persists."
             )
         
-        # Calculate risk counts from report
-        report_upper = report.upper()
-        critical_count = report_upper.count("CRITICAL")
-        high_count = report_upper.count("HIGH")
-        medium_count = report_upper.count("MEDIUM")
-        
         # Join frameworks for storage
         framework_str = " + ".join(frameworks)
         
@@ -755,9 +769,6 @@ async def create_threat_assessment(
             assessment_report=report,
             report_html=report,
             status="completed",
-            critical_count=critical_count,
-            high_count=high_count,
-            medium_count=medium_count,
             report_meta={
                 "frameworks": frameworks,
                 "risk_areas": risk_focus_areas,
@@ -776,7 +787,8 @@ async def create_threat_assessment(
         )
         db.add(assessment)
         
-        # Log audit event
+        # Log audit event (written directly, not via audit_log_writer: it commits
+        # atomically with the assessment, so neither exists without the other)
         audit_log = AuditLog(
             user_id=user.id,
             user_email=user.email,
@@ -818,8 +830,8 @@ async def create_threat_assessment(
         # Re-raise HTTP exceptions (don't catch them)
         raise
     except Exception as e:
-        # Log error
-        audit_log = AuditLog(
+        # Log error (buffered; doesn't depend on the failed request's session)
+        audit_log_writer.enqueue(
             user_id=user.id,
             user_email=user.email,
             organization_id=user.organization_id,
@@ -831,8 +843,6 @@ async def create_threat_assessment(
             ip_address=request.client.host if request.client else None,
             user_agent=request.headers.get("user-agent")
         )
-        db.add(audit_log)
-        db.commit()
         
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -846,7 +856,18 @@ async def get_reports(
     db: Session = Depends(get_db)
 ):
     """Get all threat assessments for the current user's organization with grouping by project"""
-    assessments = db.query(ThreatAssessment).filter(
+    # Only the listed columns - skips the report text/HTML, by far the widest part of each row
+    assessments = db.query(ThreatAssessment).options(load_only(
+        ThreatAssessment.id,
+        ThreatAssessment.project_name,
+        ThreatAssessment.project_number,
+        ThreatAssessment.framework,
+        ThreatAssessment.created_at,
+        ThreatAssessment.status,
+        ThreatAssessment.critical_count,
+        ThreatAssessment.high_count,
+        ThreatAssessment.medium_count,
+    )).filter(
         ThreatAssessment.organization_id == user.organization_id
     ).order_by(ThreatAssessment.created_at.desc()).all()
     
@@ -883,8 +904,10 @@ async def download_pdf(
     db: Session = Depends(get_db)
 ):
     """Download threat assessment as PDF"""
-    from fastapi.responses import Response
-    from pdf_generator import generate_pdf
+    from itertools import chain
+    from fastapi.responses import StreamingResponse
+    from starlette.concurrency import run_in_threadpool
+    from pdf_generator import iter_pdf
     
     assessment = db.query(ThreatAssessment).filter(
         ThreatAssessment.id == assessment_id,
@@ -897,20 +920,22 @@ async def download_pdf(
             detail="Assessment not found"
         )
     
-    # Generate PDF
     frameworks_str = assessment.framework  # Already joined with " + "
-    pdf_bytes = generate_pdf(
+    pdf_chunks = iter_pdf(
         assessment.assessment_report,
         assessment.project_name,
         frameworks_str
     )
+    # The whole PDF is built when the first chunk is taken: do that (in the threadpool)
+    # before responding, so a generation error is a 500, not a truncated 200
+    first_chunk = await run_in_threadpool(next, pdf_chunks, b"")
     
     # Create filename
     date_str = assessment.created_at.strftime('%Y%m%d')
     filename = f"Threat_Assessment_{assessment.project_name.replace(' ', '_')}_{date_str}.pdf"
     
-    return Response(
-        content=pdf_bytes,
+    return StreamingResponse(
+        chain((first_chunk,), pdf_chunks),
         media_type="application/pdf",
         headers={"Content-Disposition": f"attachment; filename={filename}"}
     )
@@ -0,0 +1,128 @@
+"""
+In-process cache of validated API keys
+
+Maps the key hash to a plain snapshot of the APIKey row (not the ORM
+object, so it is safe across sessions) for a short TTL. Revoking or
+deleting a key publishes an invalidation on Redis when REDIS_URL is set,
+so every API process drops it immediately; without Redis the TTL bounds
+how long a revoked key keeps working.
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+from typing import List, Optional
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+API_KEY_CACHE_TTL = 60  # seconds
+API_KEY_CACHE_MAX = 10_000
+INVALIDATION_CHANNEL = "api_key_invalidate"
+
+
+@dataclass(frozen=True)
+class CachedAPIKey:
+    """Snapshot of the APIKey fields request handling needs"""
+    id: int
+    organization_id: int
+    user_id: int
+    scopes: List[str]
+    rate_limit: Optional[int]
+    is_active: bool
+    expires_at: Optional[datetime]
+
+    @classmethod
+    def from_model(cls, api_key) -> "CachedAPIKey":
+        return cls(
+            id=api_key.id,
+            organization_id=api_key.organization_id,
+            user_id=api_key.user_id,
+            scopes=list(api_key.scopes or []),
+            rate_limit=api_key.rate_limit,
+            is_active=api_key.is_active,
+            expires_at=api_key.expires_at,
+        )
+
+
+class APIKeyCache:
+    """Thread-safe TTL + LRU map of key hash -> CachedAPIKey"""
+
+    def __init__(self, maxsize: int = API_KEY_CACHE_MAX, ttl: float = API_KEY_CACHE_TTL,
+                 redis_url: Optional[str] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._redis = None
+        self._listener = None
+        if redis_url and redis is not None:
+            try:
+                self._redis = redis.Redis.from_url(redis_url)
+            except Exception as e:
+                logger.warning(f"⚠️ Redis unavailable for API key cache invalidation: {e}")
+
+    def get(self, key_hash: str) -> Optional[CachedAPIKey]:
+        self._ensure_listener()
+        with self._lock:
+            entry = self._entries.get(key_hash)
+            if entry is None:
+                return None
+            expires, snapshot = entry
+            if expires < time.monotonic():
+                del self._entries[key_hash]
+                return None
+            self._entries.move_to_end(key_hash)
+            return snapshot
+
+    def put(self, key_hash: str, snapshot: CachedAPIKey) -> None:
+        with self._lock:
+            self._entries[key_hash] = (time.monotonic() + self.ttl, snapshot)
+            self._entries.move_to_end(key_hash)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key_id: int) -> None:
+        """Drop every cached entry for the APIKey with this id (this process only)"""
+        with self._lock:
+            for key_hash in [h for h, (_, snap) in self._entries.items() if snap.id == key_id]:
+                del self._entries[key_hash]
+
+    def publish_invalidation(self, key_id: int) -> None:
+        """Invalidate `key_id` here and, via Redis pub/sub, in every other process"""
+        self.invalidate(key_id)
+        if self._redis is not None:
+            try:
+                self._redis.publish(INVALIDATION_CHANNEL, str(key_id))
+            except Exception as e:
+                logger.warning(f"⚠️ Could not publish API key invalidation: {e}")
+
+    def _ensure_listener(self) -> None:
+        if self._redis is None or self._listener is not None:
+            return
+        with self._lock:
+            if self._listener is None:
+                self._listener = threading.Thread(target=self._listen, name="api-key-invalidation", daemon=True)
+                self._listener.start()
+
+    def _listen(self) -> None:
+        while True:
+            try:
+                pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(INVALIDATION_CHANNEL)
+                for message in pubsub.listen():
+                    self.invalidate(int(message["data"]))
+            except Exception as e:
+                logger.warning(f"⚠️ API key invalidation listener error, retrying: {e}")
+                time.sleep(5)
+
+
+api_key_cache = APIKeyCache(redis_url=os.getenv("REDIS_URL"))
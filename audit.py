@@ -48,6 +48,7 @@ class AuditLogger:
         Returns:
             AuditLog: The created audit log entry
         """
+        # Written directly, not via audit_log_writer: callers get the persisted row back
         audit_log = AuditLog(
             user_id=user.id if user else None,
             user_email=user.email if user else None,
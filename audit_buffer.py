@@ -0,0 +1,206 @@
+"""
+Buffered, batched writes for append-only log tables (AuditLog, APIUsageLog)
+
+Rows are queued in memory and a background thread bulk-inserts them in
+batches, so a request doesn't pay for its own INSERT + COMMIT. On
+PostgreSQL, large batches go through COPY FROM STDIN instead of INSERTs.
+A failed batch is retried, then written row by row so a bad row only
+loses itself.
+"""
+
+import atexit
+import io
+import json
+import logging
+import queue
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from database import SessionLocal
+from models import AuditLog, APIUsageLog
+
+logger = logging.getLogger(__name__)
+
+# Batches at least this large are written with COPY on PostgreSQL
+COPY_THRESHOLD = 100
+
+# Attempts per batch before falling back to row-by-row inserts, and the pause between them
+WRITE_ATTEMPTS = 3
+WRITE_RETRY_DELAY = 0.5  # seconds, multiplied by the attempt number
+
+# Escapes for PostgreSQL COPY text format
+_COPY_ESCAPES = str.maketrans({'\\': '\\\\', '\t': '\\t', '\n': '\\n', '\r': '\\r'})
+
+
+def _copy_value(value: Any) -> str:
+    """Render one value as a COPY text-format field"""
+    if value is None:
+        return '\\N'
+    if isinstance(value, (dict, list)):
+        value = json.dumps(value)
+    elif isinstance(value, datetime):
+        value = value.isoformat()
+    return str(value).translate(_COPY_ESCAPES)
+
+
+class BufferedAuditWriter:
+    """Queue rows for a log model and flush them in batches from a background thread"""
+
+    def __init__(
+        self,
+        model,
+        batch_size: int = 200,
+        flush_interval: float = 0.5,
+        max_queue_size: int = 10000,
+        session_factory=SessionLocal
+    ):
+        """
+        Args:
+            model: SQLAlchemy model the rows belong to
+            batch_size: Flush as soon as this many rows are queued
+            flush_interval: Flush at least this often (seconds) while rows are queued
+            max_queue_size: Queue bound; when full, enqueue writes the row synchronously
+            session_factory: Callable returning a new Session
+        """
+        self.model = model
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._session_factory = session_factory
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue_size)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stopped = threading.Event()
+        # Columns written by COPY, with the Python-side defaults INSERT would apply
+        self._copy_columns = [c for c in model.__table__.columns if not c.primary_key]
+        self._copy_defaults = {
+            c.key: c.default.arg for c in self._copy_columns
+            if c.default is not None and c.default.is_scalar
+        }
+
+    def enqueue(self, **values: Any) -> None:
+        """Queue one row (column name -> value); timestamp is fixed now to preserve ordering"""
+        values.setdefault('timestamp', datetime.utcnow())
+        self._ensure_worker()
+        try:
+            self._queue.put_nowait(values)
+        except queue.Full:
+            # Never drop audit rows - fall back to a direct write
+            logger.warning(f"⚠️ {self.model.__tablename__} buffer full, writing row synchronously")
+            self._write([values])
+
+    def flush(self) -> None:
+        """Write everything currently queued, in the caller's thread"""
+        batch = self._drain(self._queue.qsize())
+        while batch:
+            self._write(batch)
+            batch = self._drain(self.batch_size)
+
+    def close(self) -> None:
+        """Stop the background thread and flush remaining rows"""
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.flush_interval * 4)
+        self.flush()
+
+    def _ensure_worker(self) -> None:
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name=f"{self.model.__tablename__}-writer", daemon=True
+                )
+                self._thread.start()
+
+    def _drain(self, limit: int) -> List[Dict[str, Any]]:
+        batch = []
+        while len(batch) < limit:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self) -> None:
+        while not self._stopped.is_set():
+            try:
+                first = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+            batch = [first]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._write(batch)
+
+    def _write(self, batch: List[Dict[str, Any]]) -> None:
+        """Write a batch, retrying transient failures; then row by row so one bad row can't sink the rest"""
+        table = self.model.__tablename__
+        for attempt in range(1, WRITE_ATTEMPTS + 1):
+            error = self._try_write(batch)
+            if error is None:
+                return
+            logger.warning(f"⚠️ Failed to write {len(batch)} {table} rows (attempt {attempt}/{WRITE_ATTEMPTS}): {error}")
+            if attempt < WRITE_ATTEMPTS:
+                time.sleep(WRITE_RETRY_DELAY * attempt)
+        
+        if len(batch) == 1:
+            logger.error(f"❌ Dropped {table} row: {error} - {batch[0]}")
+            return
+        # Usually one bad row fails the whole batch: insert singly so only that row is lost
+        for row in batch:
+            row_error = self._try_write([row])
+            if row_error is not None:
+                logger.error(f"❌ Dropped {table} row: {row_error} - {row}")
+    
+    def _try_write(self, batch: List[Dict[str, Any]]) -> Optional[Exception]:
+        """Write a batch in one transaction; returns the error instead of raising"""
+        session = self._session_factory()
+        try:
+            if len(batch) >= COPY_THRESHOLD and session.get_bind().dialect.name == 'postgresql':
+                self._copy(session, batch)
+            else:
+                session.bulk_insert_mappings(self.model, batch)
+            session.commit()
+            return None
+        except Exception as e:
+            session.rollback()
+            return e
+        finally:
+            session.close()
+
+    def _copy(self, session, batch: List[Dict[str, Any]]) -> None:
+        """Write a batch with COPY FROM STDIN on the session's psycopg2 connection"""
+        defaults = self._copy_defaults
+        buf = io.StringIO()
+        for row in batch:
+            buf.write('\t'.join(
+                _copy_value(row[c.key] if c.key in row else defaults.get(c.key))
+                for c in self._copy_columns
+            ))
+            buf.write('\n')
+        buf.seek(0)
+        cursor = session.connection().connection.cursor()
+        try:
+            cursor.copy_from(
+                buf, self.model.__tablename__, sep='\t',
+                columns=[c.name for c in self._copy_columns]
+            )
+        finally:
+            cursor.close()
+
+
+# Shared writers
+audit_log_writer = BufferedAuditWriter(AuditLog)
+api_usage_writer = BufferedAuditWriter(APIUsageLog)
+
+atexit.register(audit_log_writer.close)
+atexit.register(api_usage_writer.close)
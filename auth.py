@@ -26,6 +26,7 @@ except ImportError:
 
 from sqlalchemy.orm import Session
 from models import User, Organization, AuditLog
+from audit_buffer import audit_log_writer
 import jwt
 import hashlib
 import bcrypt
@@ -158,7 +159,8 @@ class SAMLAuthHandler:
         # Update last login
         user.last_login = datetime.utcnow()
         
-        # Log the login
+        # Log the login (written directly, not via audit_log_writer: it commits
+        # atomically with the user creation / last_login update below)
         audit_log = AuditLog(
             user_id=user.id,
             user_email=user.email,
@@ -354,8 +356,8 @@ class PasswordAuth:
             return None
         
         if not PasswordAuth.verify_password(password, user.password_hash):
-            # Log failed login attempt
-            audit_log = AuditLog(
+            # Log failed login attempt (buffered; nothing else to commit here)
+            audit_log_writer.enqueue(
                 user_id=user.id,
                 user_email=user.email,
                 organization_id=user.organization_id,
@@ -365,14 +367,13 @@ class PasswordAuth:
                 description="Failed login attempt (incorrect password)",
                 status="failure"
             )
-            db.add(audit_log)
-            db.commit()
             return None
         
         # Update last login
         user.last_login = datetime.utcnow()
         
-        # Log successful login
+        # Log successful login (written directly, not via audit_log_writer: it
+        # commits atomically with the last_login update below)
         audit_log = AuditLog(
             user_id=user.id,
             user_email=user.email,
@@ -6,9 +6,10 @@ import os
 from typing import Generator
 
 from dotenv import load_dotenv
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, inspect, text
 from sqlalchemy.orm import sessionmaker, Session
 from sqlalchemy.pool import StaticPool
+from sqlalchemy.schema import CreateTable
 
 # Load environment variables from .env before building the engine
 load_dotenv()
@@ -65,10 +66,110 @@ def get_db() -> Generator[Session, None, None]:
         db.close()
 
 
+# Columns added to existing tables after release: (table, column, DDL).
+# create_all only creates missing tables, so these are added by upgrade_schema.
+ADDED_COLUMNS = (
+    # Existing keys were hashed with SHA256 (version 1)
+    ("api_keys", "hash_version", "INTEGER NOT NULL DEFAULT 1"),
+)
+
+
+def sqlite_generated_columns(conn, table_name):
+    """Names of the generated (computed) columns of a SQLite table"""
+    # table_xinfo's last field is 2 for VIRTUAL and 3 for STORED generated columns
+    return {row[1] for row in conn.exec_driver_sql(f"PRAGMA table_xinfo({table_name})") if row[6] in (2, 3)}
+
+
+def rebuild_sqlite_table(conn, table) -> bool:
+    """
+    Recreate a SQLite table from its model definition, keeping its rows.
+
+    SQLite can't turn an existing column into a generated one, so tables created
+    before their Computed columns are copied into a fresh table with the current
+    DDL (generated columns are recomputed, not copied), then swapped in. Runs in
+    one BEGIN IMMEDIATE transaction and re-checks under the write lock, so
+    concurrent callers rebuild at most once. Returns True if it rebuilt.
+    """
+    computed = {column.name for column in table.columns if column.computed is not None}
+    new_name = f"{table.name}_rebuild"
+    
+    conn.exec_driver_sql("BEGIN IMMEDIATE")
+    try:
+        if computed <= sqlite_generated_columns(conn, table.name):
+            conn.rollback()
+            return False
+        
+        existing = {row[1] for row in conn.exec_driver_sql(f"PRAGMA table_info({table.name})")}
+        columns = ", ".join(c.name for c in table.columns if c.name not in computed and c.name in existing)
+        ddl = str(CreateTable(table).compile(dialect=conn.dialect))
+        
+        conn.exec_driver_sql(f"DROP TABLE IF EXISTS {new_name}")
+        conn.exec_driver_sql(ddl.replace(f"CREATE TABLE {table.name} (", f"CREATE TABLE {new_name} (", 1))
+        conn.exec_driver_sql(f"INSERT INTO {new_name} ({columns}) SELECT {columns} FROM {table.name}")
+        conn.exec_driver_sql(f"DROP TABLE {table.name}")  # and its indexes
+        conn.exec_driver_sql(f"ALTER TABLE {new_name} RENAME TO {table.name}")
+        for index in table.indexes:
+            index.create(conn)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return True
+
+
+def upgrade_schema():
+    """
+    Bring existing tables up to the models (safe to run on every start):
+    add ADDED_COLUMNS on any backend and, on SQLite, rebuild tables whose
+    Computed columns predate them. PostgreSQL gets those via run_migration.py
+    (Migration 6), since that rewrite locks the table.
+    """
+    def has_column(table, column):
+        inspector = inspect(engine)
+        return column in {c["name"] for c in inspector.get_columns(table)}
+    
+    for table, column, ddl in ADDED_COLUMNS:
+        if not inspect(engine).has_table(table) or has_column(table, column):
+            continue
+        try:
+            with engine.begin() as conn:
+                conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}"))
+            print(f"✅ Added column '{table}.{column}'")
+        except Exception:
+            # Another worker starting at the same time may have added it first
+            if not has_column(table, column):
+                raise
+    
+    from models import Base
+    
+    for table in Base.metadata.sorted_tables:
+        if not any(column.computed is not None for column in table.columns):
+            continue
+        if not inspect(engine).has_table(table.name):
+            continue
+        if engine.dialect.name == "sqlite":
+            with engine.connect() as conn:
+                if rebuild_sqlite_table(conn, table):
+                    print(f"✅ Rebuilt '{table.name}' with generated columns")
+        elif engine.dialect.name == "postgresql":
+            with engine.connect() as conn:
+                generated = {
+                    row[0] for row in conn.execute(text("""
+                        SELECT column_name FROM information_schema.columns
+                        WHERE table_name = :table AND is_generated = 'ALWAYS'
+                    """), {"table": table.name})
+                }
+            missing = [c.name for c in table.columns if c.computed is not None and c.name not in generated]
+            if missing:
+                print(f"⚠️ {table.name} columns {', '.join(missing)} are not generated yet; "
+                      f"run `python run_migration.py 6` (until then they stay NULL on new rows)")
+
+
 def init_db():
     """Initialize database tables"""
     from models import Base
     Base.metadata.create_all(bind=engine)
+    upgrade_schema()
 
 
 def reset_db():
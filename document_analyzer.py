@@ -17,14 +17,30 @@ many documents or how large they are.
 """
 
 import base64
+import hashlib
 import io
 import logging
+import os
+import random
+import re
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from typing import List, Dict, Any, Tuple, Optional
 from pathlib import Path
 
 import anthropic
 
-from file_processor import resize_image_for_api
+try:
+    import pybase64 as _b64  # SIMD-accelerated drop-in for the stdlib base64 module
+except ImportError:
+    _b64 = base64
+
+from file_processor import (
+    process_file, process_files_with_vision, resize_image_for_api,
+    _get_process_pool, _discard_process_pool,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -38,6 +54,92 @@ CHARS_PER_TOKEN = 4
 MAX_IMAGES_IN_FINAL_PASS = 3        # Max images to include in the final assessment
 EXTRACTION_MAX_TOKENS = 4_000        # Max output tokens per document extraction
 EXTRACTION_MODEL = "claude-sonnet-4-20250514"
+MAP_MAX_INPUT_TOKENS = 180_000       # Max document tokens per MAP call (leaves room for prompt + output)
+MAP_MAX_ATTEMPTS = 4                 # Attempts per MAP call on transient errors
+# Statuses the SDK's own retry logic treats as transient (timeout, lock conflict, rate limit, server errors)
+RETRYABLE_STATUS_CODES = (408, 409, 429, 500, 502, 503, 504, 529)
+
+# MAP prompts: static instructions in the system prompt, per-document content in the
+# user message. (Not marked for prompt caching: at a few hundred tokens these are
+# below the API's minimum cacheable prefix, so cache_control would do nothing.)
+_TEXT_SYSTEM_PROMPT = """You are a security analyst extracting threat-modeling-relevant information from a project document.
+
+**YOUR TASK:**
+Extract and summarize ALL security-relevant information from the document. Be thorough — anything you miss here will NOT be available for the threat assessment. Structure your extraction as:
+
+1. **System Components & Architecture** — every component, service, database, API, queue, cache mentioned
+2. **Data Flows & Integration Points** — how data moves between components, external APIs, third-party services
+3. **Authentication & Authorization** — auth mechanisms, identity providers, token handling, session management
+4. **Sensitive Data** — PII, financial data, credentials, API keys, certificates mentioned
+5. **Infrastructure & Deployment** — cloud services, containers, networking, load balancers, CDNs
+6. **Existing Security Controls** — encryption, firewalls, WAF, logging, monitoring mentioned
+7. **Trust Boundaries** — where internal meets external, privilege escalation points
+8. **Compliance & Regulatory References** — any standards, regulations, or policies mentioned
+9. **Known Risks or Concerns** — anything the document flags as a risk, limitation, or technical debt
+
+Be specific. Include names, versions, protocols, ports, and configurations. Quote exact text where important.
+If a section has no relevant content, write "None identified in this document."
+"""
+
+_TEXT_PROMPT_TPL = """**Project Context:** {project_context}
+**Document:** {doc_name}
+
+**DOCUMENT CONTENT:**
+{doc_text}
+"""
+
+_IMG_SYSTEM_PROMPT = """You are a security analyst examining an architecture or technical diagram for a threat assessment.
+
+Analyze the diagram and extract ALL security-relevant information:
+
+1. **Components Identified** — every system, service, database, user, external entity visible
+2. **Data Flows** — direction of arrows, protocols, what data moves where
+3. **Trust Boundaries** — any borders, zones, DMZ lines, VPC boundaries, network segments
+4. **External Interfaces** — internet-facing components, third-party integrations, APIs
+5. **Security Controls Visible** — firewalls, load balancers, WAFs, encryption indicators
+6. **Potential Concerns** — missing security controls, exposed components, single points of failure
+
+Be extremely detailed. This textual description will be the ONLY representation of this diagram in the final threat assessment — the image itself won't be available. Name every component, every arrow, every label you can see."""
+
+_IMG_PROMPT_TPL = """**Project Context:** {project_context}
+**Image:** {img_name}"""
+
+
+# Filename keywords used to rank images for visual inclusion in the final pass
+_PRIORITY_GROUP_SCORES = {
+    'architecture': 10,   # Architecture-related keywords get highest priority
+    'flow': 8,
+    'deployment': 6,
+    'security': 5,
+    'screenshot': -3,     # Penalize screenshots and generic names
+}
+_PRIORITY_KEYWORDS = {
+    **dict.fromkeys(['arch', 'system', 'infrastructure', 'network', 'topology'], 'architecture'),
+    **dict.fromkeys(['flow', 'data', 'sequence', 'diagram'], 'flow'),
+    **dict.fromkeys(['deploy', 'cloud', 'aws', 'azure', 'gcp'], 'deployment'),
+    **dict.fromkeys(['security', 'threat', 'risk', 'trust'], 'security'),
+    **dict.fromkeys(['screenshot', 'screen', 'photo', 'img_'], 'screenshot'),
+}
+# One pattern per group, each searched separately: a single alternation's
+# findall skips keywords overlapping an earlier match ("aws" in "dataws")
+_PRIORITY_GROUP_RES = {
+    group: re.compile("|".join(re.escape(kw) for kw, kw_group in _PRIORITY_KEYWORDS.items() if kw_group == group))
+    for group in _PRIORITY_GROUP_SCORES
+}
+
+# Image extensions routed to vision analysis, and their API media types
+_IMAGE_EXTS = frozenset({'png', 'jpg', 'jpeg', 'gif', 'webp'})
+_MEDIA_TYPES = {
+    'jpg': 'image/jpeg', 'jpeg': 'image/jpeg',
+    'png': 'image/png', 'gif': 'image/gif', 'webp': 'image/webp'
+}
+
+# MAP extraction cache: unchanged documents skip the Claude call on re-runs
+CACHE_DIR = Path(os.environ.get("TM_CACHE_DIR", "/tmp/tm_cache"))
+CACHE_MAX_MB = int(os.environ.get("TM_CACHE_MAX_MB", "500"))
+
+# Images smaller than this are resized in-process; shipping them to a pool worker costs more than the resize
+PROCESS_POOL_MIN_IMAGE_BYTES = 256 * 1024
 
 
 def estimate_tokens(text: str) -> int:
@@ -45,18 +147,178 @@ def estimate_tokens(text: str) -> int:
     return len(text) // CHARS_PER_TOKEN
 
 
+def _cache_key(doc_text: str, project_context: str) -> str:
+    """Cache key for a text extraction: model + project context + document text"""
+    return hashlib.sha256((EXTRACTION_MODEL + "|" + project_context + "|" + doc_text).encode()).hexdigest()
+
+
+def _image_cache_key(raw_bytes: bytes, media_type: str, project_context: str) -> str:
+    """Cache key for an image extraction, based on the decoded bytes so re-encodings still hit"""
+    h = hashlib.sha256((EXTRACTION_MODEL + "|" + project_context + "|" + media_type + "|").encode())
+    h.update(raw_bytes)
+    return h.hexdigest()
+
+
+def _cache_dir_private() -> bool:
+    """
+    Create CACHE_DIR (mode 0700) if needed and check it is private to this user.
+    
+    Extractions hold uploaded document text, so the cache is skipped when the
+    directory is readable or writable by anyone else.
+    """
+    try:
+        CACHE_DIR.mkdir(mode=0o700, parents=True, exist_ok=True)
+        st = CACHE_DIR.stat()
+    except OSError as e:
+        logger.warning(f"⚠️ Could not create extraction cache directory: {e}")
+        return False
+    if st.st_uid != os.getuid() or st.st_mode & 0o077:
+        logger.warning(f"⚠️ Extraction cache directory {CACHE_DIR} is not private to this user, not using it")
+        return False
+    return True
+
+
+def _cache_get(key: str) -> Optional[str]:
+    """Return a cached extraction, or None on a miss"""
+    if not _cache_dir_private():
+        return None
+    path = CACHE_DIR / f"{key}.md"
+    try:
+        extraction = path.read_text(encoding="utf-8")
+        os.utime(path)  # Mark as recently used for LRU eviction
+        return extraction
+    except OSError:
+        return None
+
+
+def _cache_put(key: str, extraction: str) -> None:
+    """Atomically store an extraction, then evict least-recently-used entries if over budget"""
+    if not _cache_dir_private():
+        return
+    try:
+        # Unique temp file per write, so threads storing the same key don't collide
+        fd, tmp_path = tempfile.mkstemp(dir=CACHE_DIR, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(extraction)
+            os.replace(tmp_path, CACHE_DIR / f"{key}.md")
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        _evict_cache()
+    except OSError as e:
+        logger.warning(f"⚠️ Could not write extraction cache: {e}")
+
+
+def _evict_cache() -> None:
+    """Delete least-recently-used cache entries until the cache fits in CACHE_MAX_MB"""
+    entries = []
+    total_size = 0
+    for entry in os.scandir(CACHE_DIR):
+        if entry.name.endswith(".md"):
+            st = entry.stat()
+            entries.append((st.st_mtime, st.st_size, entry.path))
+            total_size += st.st_size
+    
+    max_bytes = CACHE_MAX_MB * 1024 * 1024
+    if total_size <= max_bytes:
+        return
+    
+    entries.sort()
+    for _, size, path in entries:
+        if total_size <= max_bytes:
+            break
+        try:
+            os.remove(path)
+            total_size -= size
+        except OSError:
+            pass
+
+
+def _call_with_retry(client: anthropic.Anthropic, **kwargs):
+    """
+    Call client.messages.create, retrying transient failures (connection
+    errors, timeouts and RETRYABLE_STATUS_CODES responses) with exponential
+    backoff, honoring Retry-After when the API sends one.
+    
+    Any other error, or the last failed attempt, is raised to the caller.
+    The SDK's own retries are turned off for these calls, so MAP_MAX_ATTEMPTS
+    is the total number of HTTP attempts.
+    """
+    client = client.with_options(max_retries=0)
+    for attempt in range(MAP_MAX_ATTEMPTS):
+        try:
+            return client.messages.create(**kwargs)
+        except anthropic.APIConnectionError as e:
+            # Includes APITimeoutError
+            if attempt == MAP_MAX_ATTEMPTS - 1:
+                raise
+            delay = min(2 ** attempt + random.random(), 30)
+            logger.warning(f"  ⏳ API connection failed ({type(e).__name__}), retrying in {delay:.1f}s "
+                           f"(attempt {attempt + 1}/{MAP_MAX_ATTEMPTS})")
+            time.sleep(delay)
+        except anthropic.APIStatusError as e:
+            if e.status_code not in RETRYABLE_STATUS_CODES or attempt == MAP_MAX_ATTEMPTS - 1:
+                raise
+            delay = min(2 ** attempt + random.random(), 30)
+            retry_after = e.response.headers.get('retry-after') if e.response is not None else None
+            if retry_after:
+                try:
+                    delay = min(float(retry_after), 30)
+                except ValueError:
+                    pass
+            logger.warning(f"  ⏳ API returned {e.status_code}, retrying in {delay:.1f}s "
+                           f"(attempt {attempt + 1}/{MAP_MAX_ATTEMPTS})")
+            time.sleep(delay)
+
+
+def _split_into_chunks(text: str, max_tokens: int) -> List[str]:
+    """
+    Split text into chunks of at most max_tokens, breaking at paragraph boundaries.
+    
+    Paragraphs that are larger than the budget on their own are hard-sliced.
+    """
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    chunks = []
+    current = []
+    current_chars = 0
+    
+    for paragraph in text.split("\n\n"):
+        while len(paragraph) > max_chars:
+            if current:
+                chunks.append("\n\n".join(current))
+                current, current_chars = [], 0
+            chunks.append(paragraph[:max_chars])
+            paragraph = paragraph[max_chars:]
+        
+        # +2 for the paragraph separator
+        if current and current_chars + len(paragraph) + 2 > max_chars:
+            chunks.append("\n\n".join(current))
+            current, current_chars = [], 0
+        current.append(paragraph)
+        current_chars += len(paragraph) + 2
+    
+    if current:
+        chunks.append("\n\n".join(current))
+    
+    return chunks
+
+
 def needs_multi_pass(text_contents: List[Dict], image_contents: List[Dict]) -> bool:
     """
     Determine whether the document set is too large for a single API call.
     
     Returns True if multi-pass is needed, False if single-pass will work.
     """
-    total_text_tokens = sum(estimate_tokens(doc.get('text', '')) for doc in text_contents)
     num_images = len(image_contents)
     
-    if total_text_tokens > SINGLE_PASS_MAX_TEXT_TOKENS:
-        logger.info(f"📊 Multi-pass needed: {total_text_tokens:,} text tokens > {SINGLE_PASS_MAX_TEXT_TOKENS:,} limit")
-        return True
+    # Running total with early exit; largest docs first so the threshold trips as soon as possible
+    total_text_tokens = 0
+    for doc in sorted(text_contents, key=lambda d: len(d.get('text', '')), reverse=True):
+        total_text_tokens += estimate_tokens(doc.get('text', ''))
+        if total_text_tokens > SINGLE_PASS_MAX_TEXT_TOKENS:
+            logger.info(f"📊 Multi-pass needed: {total_text_tokens:,}+ text tokens > {SINGLE_PASS_MAX_TEXT_TOKENS:,} limit")
+            return True
     
     if num_images > SINGLE_PASS_MAX_IMAGES:
         logger.info(f"📊 Multi-pass needed: {num_images} images > {SINGLE_PASS_MAX_IMAGES} limit")
@@ -84,42 +346,49 @@ def _extract_from_text_document(
         logger.info(f"  📄 {doc_name}: small doc ({estimate_tokens(doc_text)} tokens), keeping as-is")
         return f"### {doc_name}\n{doc_text}"
     
-    prompt = f"""You are a security analyst extracting threat-modeling-relevant information from a project document.
-
-**Project Context:** {project_context}
-**Document:** {doc_name}
-
-**DOCUMENT CONTENT:**
-{doc_text}
-
-**YOUR TASK:**
-Extract and summarize ALL security-relevant information from this document. Be thorough — anything you miss here will NOT be available for the threat assessment. Structure your extraction as:
-
-1. **System Components & Architecture** — every component, service, database, API, queue, cache mentioned
-2. **Data Flows & Integration Points** — how data moves between components, external APIs, third-party services
-3. **Authentication & Authorization** — auth mechanisms, identity providers, token handling, session management
-4. **Sensitive Data** — PII, financial data, credentials, API keys, certificates mentioned
-5. **Infrastructure & Deployment** — cloud services, containers, networking, load balancers, CDNs
-6. **Existing Security Controls** — encryption, firewalls, WAF, logging, monitoring mentioned
-7. **Trust Boundaries** — where internal meets external, privilege escalation points
-8. **Compliance & Regulatory References** — any standards, regulations, or policies mentioned
-9. **Known Risks or Concerns** — anything the document flags as a risk, limitation, or technical debt
-
-Be specific. Include names, versions, protocols, ports, and configurations. Quote exact text where important.
-If a section has no relevant content, write "None identified in this document."
-"""
-
+    cache_key = _cache_key(doc_text, project_context)
+    cached = _cache_get(cache_key)
+    if cached is not None:
+        logger.info(f"  📄 {doc_name}: using cached extraction")
+        return cached
+    
+    doc_tokens = estimate_tokens(doc_text)
+    if doc_tokens > MAP_MAX_INPUT_TOKENS:
+        chunks = _split_into_chunks(doc_text, MAP_MAX_INPUT_TOKENS)
+        logger.warning(f"  ⚠️ {doc_name}: {doc_tokens:,} tokens exceeds {MAP_MAX_INPUT_TOKENS:,} per-call limit, "
+                       f"splitting into {len(chunks)} parts")
+    else:
+        chunks = [doc_text]
+    
     try:
-        message = client.messages.create(
-            model=EXTRACTION_MODEL,
-            max_tokens=EXTRACTION_MAX_TOKENS,
-            temperature=0,
-            messages=[{"role": "user", "content": prompt}]
-        )
-        extraction = message.content[0].text
+        extractions = []
+        for part, chunk in enumerate(chunks, 1):
+            part_label = f" (part {part}/{len(chunks)})" if len(chunks) > 1 else ""
+            prompt = _TEXT_PROMPT_TPL.format_map({
+                'project_context': project_context,
+                'doc_name': doc_name + part_label,
+                'doc_text': chunk,
+            })
+            
+            message = _call_with_retry(
+                client,
+                model=EXTRACTION_MODEL,
+                max_tokens=EXTRACTION_MAX_TOKENS,
+                temperature=0,
+                system=_TEXT_SYSTEM_PROMPT,
+                messages=[{"role": "user", "content": prompt}]
+            )
+            if len(chunks) > 1:
+                extractions.append(f"### Part {part}/{len(chunks)}\n{message.content[0].text}")
+            else:
+                extractions.append(message.content[0].text)
+        
+        extraction = "\n\n".join(extractions)
         tokens_used = estimate_tokens(extraction)
-        logger.info(f"  📄 {doc_name}: extracted {tokens_used} tokens from {estimate_tokens(doc_text)} original")
-        return f"### Extracted from: {doc_name}\n{extraction}"
+        logger.info(f"  📄 {doc_name}: extracted {tokens_used} tokens from {doc_tokens} original")
+        result = f"### Extracted from: {doc_name}\n{extraction}"
+        _cache_put(cache_key, result)
+        return result
     
     except Exception as e:
         logger.error(f"  ❌ {doc_name}: extraction failed: {e}")
@@ -132,35 +401,37 @@ If a section has no relevant content, write "None identified in this document."
 def _extract_from_image(
     client: anthropic.Anthropic,
     img_name: str,
-    base64_data: str,
+    raw_bytes: Optional[bytes],
     media_type: str,
-    project_context: str
+    project_context: str,
+    original_base64: Optional[str] = None
 ) -> str:
     """
     Pass 1 - MAP: Analyze a single image (architecture diagram, data flow, etc.)
     and produce a detailed textual description for use in the final assessment.
+    
+    raw_bytes is None for frontend base64 that didn't decode; original_base64 is
+    then sent as-is (and the result isn't cached).
     """
-    prompt = f"""You are a security analyst examining an architecture or technical diagram for a threat assessment.
-
-**Project Context:** {project_context}
-**Image:** {img_name}
-
-Analyze this diagram and extract ALL security-relevant information:
-
-1. **Components Identified** — every system, service, database, user, external entity visible
-2. **Data Flows** — direction of arrows, protocols, what data moves where
-3. **Trust Boundaries** — any borders, zones, DMZ lines, VPC boundaries, network segments
-4. **External Interfaces** — internet-facing components, third-party integrations, APIs
-5. **Security Controls Visible** — firewalls, load balancers, WAFs, encryption indicators
-6. **Potential Concerns** — missing security controls, exposed components, single points of failure
-
-Be extremely detailed. This textual description will be the ONLY representation of this diagram in the final threat assessment — the image itself won't be available. Name every component, every arrow, every label you can see."""
+    cache_key = _image_cache_key(raw_bytes, media_type, project_context) if raw_bytes is not None else None
+    if cache_key:
+        cached = _cache_get(cache_key)
+        if cached is not None:
+            logger.info(f"  🖼️  {img_name}: using cached extraction")
+            return cached
+    
+    prompt = _IMG_PROMPT_TPL.format_map({
+        'project_context': project_context,
+        'img_name': img_name,
+    })
 
     try:
-        message = client.messages.create(
+        message = _call_with_retry(
+            client,
             model=EXTRACTION_MODEL,
             max_tokens=EXTRACTION_MAX_TOKENS,
             temperature=0,
+            system=_IMG_SYSTEM_PROMPT,
             messages=[{
                 "role": "user",
                 "content": [
@@ -170,7 +441,7 @@ Be extremely detailed. This textual description will be the ONLY representation
                         "source": {
                             "type": "base64",
                             "media_type": media_type,
-                            "data": base64_data
+                            "data": _image_base64(raw_bytes, original_base64)
                         }
                     }
                 ]
@@ -178,7 +449,10 @@ Be extremely detailed. This textual description will be the ONLY representation
         )
         extraction = message.content[0].text
         logger.info(f"  🖼️  {img_name}: extracted {estimate_tokens(extraction)} tokens from image")
-        return f"### Architecture Diagram Analysis: {img_name}\n{extraction}"
+        result = f"### Architecture Diagram Analysis: {img_name}\n{extraction}"
+        if cache_key:
+            _cache_put(cache_key, result)
+        return result
     
     except Exception as e:
         logger.error(f"  ❌ {img_name}: image analysis failed: {e}")
@@ -194,23 +468,12 @@ def _select_priority_images(image_files: List[Dict]) -> Tuple[List[Dict], List[D
     - Larger images (more detail) > smaller ones
     - First MAX_IMAGES_IN_FINAL_PASS are selected for visual inclusion
     """
-    # Score images by filename heuristic
+    # Score images by filename heuristic: each keyword group counts once
     def priority_score(img: Dict) -> int:
         name = img.get('name', '').lower()
-        score = 0
-        # Architecture-related keywords get highest priority
-        if any(kw in name for kw in ['arch', 'system', 'infrastructure', 'network', 'topology']):
-            score += 10
-        if any(kw in name for kw in ['flow', 'data', 'sequence', 'diagram']):
-            score += 8
-        if any(kw in name for kw in ['deploy', 'cloud', 'aws', 'azure', 'gcp']):
-            score += 6
-        if any(kw in name for kw in ['security', 'threat', 'risk', 'trust']):
-            score += 5
-        # Penalize screenshots and generic names
-        if any(kw in name for kw in ['screenshot', 'screen', 'photo', 'img_']):
-            score -= 3
-        return score
+        return sum(
+            _PRIORITY_GROUP_SCORES[group] for group, pattern in _PRIORITY_GROUP_RES.items() if pattern.search(name)
+        )
     
     sorted_images = sorted(image_files, key=priority_score, reverse=True)
     
@@ -224,6 +487,118 @@ def _select_priority_images(image_files: List[Dict]) -> Tuple[List[Dict], List[D
     return visual_images, text_only_images
 
 
+def _classify_files(files_data: List[Dict]) -> Tuple[List[Tuple], List[Tuple]]:
+    """
+    Split uploaded files into text and image jobs without doing any parsing.
+    
+    Returns:
+        Tuple of:
+            - raw_text_jobs: list of (filename, content_bytes)
+            - raw_image_jobs: list of (filename, content, ext), where content is
+              either raw bytes or a base64 string with any data-URL prefix stripped
+    """
+    raw_text_jobs = []
+    raw_image_jobs = []
+    
+    for file_data in files_data:
+        filename = file_data.get('name', 'unknown')
+        content = file_data.get('content', b'')
+        ext = Path(filename).suffix.lower().lstrip('.')
+        
+        if ext in _IMAGE_EXTS:
+            if isinstance(content, str) and content.startswith('data:'):
+                if ';base64,' in content:
+                    content = content.split(';base64,', 1)[1]
+            raw_image_jobs.append((filename, content, ext))
+        else:
+            raw_text_jobs.append((filename, content if isinstance(content, bytes) else content.encode('utf-8')))
+    
+    return raw_text_jobs, raw_image_jobs
+
+
+def _prepare_text_doc(filename: str, content: bytes) -> Dict:
+    """Extract text from a single non-image file"""
+    text = process_file(filename, content)
+    return {
+        'name': filename,
+        'text': text,
+        'tokens': estimate_tokens(text)
+    }
+
+
+def _resize_encode(raw_bytes: bytes) -> bytes:
+    """
+    Process-pool worker: resize a single image.
+    
+    Returns raw bytes; base64 encoding is deferred until the image is sent to
+    the API, so the result pickled back across the process boundary isn't 4/3 larger.
+    """
+    return resize_image_for_api(raw_bytes)
+
+
+def _image_base64(raw_bytes: Optional[bytes], original_base64: Optional[str]) -> str:
+    """Base64 payload for the API: encoded from the raw bytes, or the original string if it never decoded"""
+    if raw_bytes is None:
+        return original_base64
+    return _b64.standard_b64encode(raw_bytes).decode('ascii')
+
+
+def _prepare_image_docs(raw_image_jobs: List[Tuple]) -> List[Dict]:
+    """
+    Decode and resize images, keeping them as raw bytes.
+    
+    Base64 encoding is deferred to the point each image is sent to the API, so
+    only one copy of each image (the raw bytes) stays resident.
+    
+    Image decode/resize is CPU-bound Pillow work, so large images are fanned out
+    to file_processor's long-lived worker pool; small ones (and single images)
+    are handled serially.
+    """
+    # Decode frontend base64 up front; None means "send the original string as-is"
+    image_bytes_list = []
+    for filename, content, ext in raw_image_jobs:
+        if isinstance(content, str):
+            try:
+                image_bytes_list.append(_b64.b64decode(content))
+            except Exception as e:
+                logger.warning(f"⚠️  {filename}: could not decode base64 image data, sending it as-is: {e}")
+                image_bytes_list.append(None)
+        else:
+            image_bytes_list.append(content)
+    
+    resized = list(image_bytes_list)
+    pooled = [i for i, raw in enumerate(image_bytes_list)
+              if raw is not None and len(raw) >= PROCESS_POOL_MIN_IMAGE_BYTES]
+    if len(pooled) < 2:
+        pooled = []
+    
+    if pooled:
+        pool = _get_process_pool()
+        try:
+            for i, raw in zip(pooled, pool.map(_resize_encode, [image_bytes_list[i] for i in pooled])):
+                resized[i] = raw
+        except BrokenProcessPool as e:
+            logger.warning(f"⚠️  Image resize worker pool failed ({e}), resizing in-process")
+            _discard_process_pool(pool)
+            pooled = []
+    
+    pooled_set = set(pooled)
+    for i, raw in enumerate(image_bytes_list):
+        if raw is not None and i not in pooled_set:
+            resized[i] = _resize_encode(raw)
+    
+    image_docs = []
+    for (filename, content, ext), raw in zip(raw_image_jobs, resized):
+        image_docs.append({
+            'name': filename,
+            'raw': raw,
+            'original_base64': content if raw is None else None,
+            'media_type': _MEDIA_TYPES.get(ext, 'image/jpeg')
+        })
+    
+    return image_docs
+
+
 def prepare_documents_multi_pass(
     client: anthropic.Anthropic,
     files_data: List[Dict],
@@ -249,52 +624,15 @@ def prepare_documents_multi_pass(
     """
     project_context = f"{project_name} ({application_type})"
     
-    # ── Step 1: Separate text documents from images ──
+    # ── Step 1: Separate text documents from images, then preprocess in parallel ──
+    raw_text_jobs, raw_image_jobs = _classify_files(files_data)
+    
     text_docs = []
-    image_docs = []
+    if raw_text_jobs:
+        with ThreadPoolExecutor(max_workers=min(8, len(raw_text_jobs))) as executor:
+            text_docs = list(executor.map(lambda job: _prepare_text_doc(*job), raw_text_jobs))
     
-    for file_data in files_data:
-        filename = file_data.get('name', 'unknown')
-        content = file_data.get('content', b'')
-        ext = Path(filename).suffix.lower().lstrip('.')
-        
-        if ext in ['png', 'jpg', 'jpeg', 'gif', 'webp']:
-            # Prepare image data
-            if isinstance(content, str):
-                base64_data = content
-                if base64_data.startswith('data:'):
-                    if ';base64,' in base64_data:
-                        base64_data = base64_data.split(';base64,', 1)[1]
-                # Decode, resize, re-encode
-                try:
-                    raw_bytes = base64.b64decode(base64_data)
-                    raw_bytes = resize_image_for_api(raw_bytes)
-                    base64_data = base64.standard_b64encode(raw_bytes).decode('utf-8')
-                except Exception:
-                    pass  # Use original if resize fails
-            else:
-                content = resize_image_for_api(content)
-                base64_data = base64.standard_b64encode(content).decode('utf-8')
-            
-            media_type_map = {
-                'jpg': 'image/jpeg', 'jpeg': 'image/jpeg',
-                'png': 'image/png', 'gif': 'image/gif', 'webp': 'image/webp'
-            }
-            
-            image_docs.append({
-                'name': filename,
-                'base64': base64_data,
-                'media_type': media_type_map.get(ext, 'image/jpeg')
-            })
-        else:
-            # Extract text from file
-            from file_processor import process_file
-            text = process_file(filename, content if isinstance(content, bytes) else content.encode('utf-8'))
-            text_docs.append({
-                'name': filename,
-                'text': text,
-                'tokens': estimate_tokens(text)
-            })
+    image_docs = _prepare_image_docs(raw_image_jobs)
     
     total_text_tokens = sum(d['tokens'] for d in text_docs)
     total_images = len(image_docs)
@@ -305,13 +643,16 @@ def prepare_documents_multi_pass(
     if not needs_multi_pass(text_docs, image_docs):
         # Single pass — return content as-is for the existing flow
         logger.info("✅ Using single-pass processing")
-        from file_processor import process_files_with_vision
         return process_files_with_vision(files_data)
     
     # ── Step 3: Multi-pass MAP phase ──
     logger.info(f"🔄 Starting multi-pass MAP phase ({len(text_docs)} text + {total_images} images)...")
     
-    extracted_sections = []
+    # Extractions are written into one buffer as they complete. getvalue() copies
+    # it at the end, so the combined output briefly exists twice (as with a list +
+    # join); the gain is not keeping every extraction string alive until then
+    combined_buf = io.StringIO()
+    section_separator = "\n\n---\n\n"
     total_steps = len(text_docs) + total_images
     current_step = 0
     
@@ -328,7 +669,9 @@ def prepare_documents_multi_pass(
         extraction = _extract_from_text_document(
             client, doc['name'], doc['text'], project_context
         )
-        extracted_sections.append(extraction)
+        if combined_buf.tell():
+            combined_buf.write(section_separator)
+        combined_buf.write(extraction)
     
     # 3b: Analyze each image
     for img in image_docs:
@@ -341,14 +684,17 @@ def prepare_documents_multi_pass(
         
         logger.info(f"  [{current_step}/{total_steps}] Analyzing image: {img['name']}")
         extraction = _extract_from_image(
-            client, img['name'], img['base64'], img['media_type'], project_context
+            client, img['name'], img['raw'], img['media_type'], project_context, img['original_base64']
         )
-        extracted_sections.append(extraction)
+        if combined_buf.tell():
+            combined_buf.write(section_separator)
+        combined_buf.write(extraction)
     
     # ── Step 4: Prepare final content for REDUCE phase ──
     
     # Combine all extracted text
-    combined_text = "\n\n---\n\n".join(extracted_sections)
+    combined_text = combined_buf.getvalue()
+    combined_buf.close()
     combined_tokens = estimate_tokens(combined_text)
     
     logger.info(f"📦 MAP phase complete: {combined_tokens:,} tokens from {total_steps} sources")
@@ -366,7 +712,7 @@ def prepare_documents_multi_pass(
                 'source': {
                     'type': 'base64',
                     'media_type': img['media_type'],
-                    'data': img['base64']
+                    'data': _image_base64(img['raw'], img['original_base64'])
                 }
             },
             'type': 'image'
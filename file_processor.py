@@ -5,30 +5,162 @@ Supports PDF, DOCX, XLSX, images (PNG, JPG) with OCR
 
 import io
 import base64
-from typing import Optional, Dict, Any
-from pathlib import Path
+import importlib.util
+import mmap
+import multiprocessing
+import os
+import queue
+import threading
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional, Dict, Any, List
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Optional document/image backends, imported once at module load. A missing
+# backend is None and the extractor that needs it reports the ImportError.
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
 
-def resize_image_for_api(file_content: bytes, max_dimension: int = 1568) -> bytes:
+try:
+    import PyPDF2
+except ImportError:
+    PyPDF2 = None
+
+try:
+    import pypdfium2 as pdfium
+except ImportError:
+    pdfium = None
+
+try:
+    from docx import Document as _DocxDocument
+except ImportError:
+    _DocxDocument = None
+
+try:
+    from lxml import etree as _etree
+except ImportError:
+    _etree = None
+
+try:
+    import openpyxl
+except ImportError:
+    openpyxl = None
+
+try:
+    import pytesseract
+except ImportError:
+    pytesseract = None
+
+try:
+    import pybase64 as _b64  # SIMD-accelerated drop-in for the stdlib base64 module
+    _b64encode_str = _b64.b64encode_as_string
+except ImportError:
+    _b64 = base64
+
+    def _b64encode_str(data: bytes) -> str:
+        return base64.standard_b64encode(data).decode('ascii')
+
+try:
+    # SIMD (SSE4.1/AVX2) convolution resizer; built once so its weight tables are reused
+    from cykooz.resizer import Resizer, ResizeAlg, FilterType
+    _RESIZER = Resizer(ResizeAlg.convolution(FilterType.lanczos3))
+except ImportError:
+    _RESIZER = None
+
+# Persistent in-process Tesseract handles (no subprocess/model load per image);
+# imported on first OCR by _get_ocr_apis
+_HAS_TESSEROCR = importlib.util.find_spec('tesserocr') is not None
+
+OCR_POOL_SIZE = os.cpu_count() or 1
+_ocr_apis: Optional[queue.Queue] = None
+_ocr_apis_lock = threading.Lock()
+
+# Document batches at least this large (total upload bytes) are extracted in the
+# shared process pool; below it, pickling the payloads to workers costs more than
+# the parallel extraction saves
+PROCESS_POOL_MIN_TOTAL_BYTES = 2 * 1024 * 1024
+PROCESS_POOL_SIZE = os.cpu_count() or 1
+_process_pool: Optional[ProcessPoolExecutor] = None
+_process_pool_lock = threading.Lock()
+
+# PyPDF2 only checks for image-only (scanned) pages in PDFs larger than this;
+# small text PDFs always get full per-page extraction
+IMAGE_PAGE_SKIP_MIN_PDF_BYTES = 5_000_000
+
+# Image files that process_file OCRs when not using the vision API
+OCR_IMAGE_EXTENSIONS = frozenset({'png', 'jpg', 'jpeg', 'gif', 'webp', 'bmp'})
+
+# Image extensions accepted by the Claude Vision API, with their media types
+_MEDIA_TYPE_MAP = {
+    'jpg': 'image/jpeg',
+    'jpeg': 'image/jpeg',
+    'png': 'image/png',
+    'gif': 'image/gif',
+    'webp': 'image/webp'
+}
+
+# Whitespace removed from frontend base64 payloads, as a str.translate delete table
+_B64_WHITESPACE = ' \n\r\t'
+_B64_STRIP = str.maketrans('', '', _B64_WHITESPACE)
+
+# Claude's vision processes images at ~1568px max internally
+API_MAX_IMAGE_DIMENSION = 1568
+
+
+def _file_extension(filename: str) -> str:
+    """Lower-cased extension without the dot ('' if none)"""
+    _, dot, ext = filename.rpartition('.')
+    return ext.lower() if dot else ''
+
+
+def _require(module, name: str) -> None:
+    """Raise the ImportError a per-call import of a missing optional backend would have"""
+    if module is None:
+        raise ImportError(f"No module named '{name}'")
+
+
+def _resize_simd(img, max_dimension: int, img_format: str):
+    """Lanczos3 downscale with cykooz.resizer, preserving aspect ratio like Image.thumbnail"""
+    if img.mode not in ('RGB', 'RGBA', 'L'):
+        img = img.convert('RGB' if img_format.upper() == 'JPEG' else 'RGBA')
+    width, height = img.size
+    scale = max_dimension / max(width, height)
+    target_size = (max(1, round(width * scale)), max(1, round(height * scale)))
+    dst = Image.new(img.mode, target_size)
+    _RESIZER.resize_pil(img, dst)
+    return dst
+
+
+def resize_image_for_api(file_content: bytes, max_dimension: int = API_MAX_IMAGE_DIMENSION, img=None) -> bytes:
     """
     Resize image to reduce token consumption while preserving readability.
     Claude's vision processes images at ~1568px max internally, so anything
     larger just wastes tokens without improving analysis quality.
+    
+    Pass `img` if the caller already has `file_content` opened with
+    Image.open, so the header isn't parsed twice. Returns `file_content`
+    itself when no resize is needed.
     """
     try:
-        from PIL import Image
-        img = Image.open(io.BytesIO(file_content))
+        if img is None:
+            _require(Image, 'PIL')
+            img = Image.open(io.BytesIO(file_content))
         original_size = img.size
         
         # Only resize if larger than max_dimension
         if max(img.size) > max_dimension:
-            img.thumbnail((max_dimension, max_dimension), Image.LANCZOS)
-            buffer = io.BytesIO()
             # Use original format if available, otherwise PNG
             img_format = img.format or 'PNG'
+            if _RESIZER is not None:
+                img = _resize_simd(img, max_dimension, img_format)
+            else:
+                img.thumbnail((max_dimension, max_dimension), Image.LANCZOS)
+            buffer = io.BytesIO()
             if img_format.upper() == 'JPEG':
                 img.save(buffer, format='JPEG', quality=85)
             else:
@@ -47,27 +179,122 @@ def resize_image_for_api(file_content: bytes, max_dimension: int = 1568) -> byte
         return file_content
 
 
+def _extract_text_from_pdf_pdfium(pdf_source) -> str:
+    """Extract PDF text with PDFium (native C++), skipping pages with no text layer"""
+    pdf = pdfium.PdfDocument(pdf_source)
+    try:
+        page_texts = []
+        for page in pdf:
+            textpage = page.get_textpage()
+            # Scanned/image-only page: nothing to extract
+            if textpage.count_chars() == 0:
+                continue
+            page_texts.append(textpage.get_text_range())
+        return "\n".join(page_texts).strip()
+    finally:
+        pdf.close()
+
+
+def _pdf_page_is_image_only(page) -> bool:
+    """True if a PyPDF2 page draws images but has no text objects (BT ... ET) in its content stream"""
+    try:
+        xobjects = page['/Resources'].get_object().get('/XObject')
+        if xobjects is None:
+            return False
+        xobjects = xobjects.get_object()
+        if not any(xobjects[name].get_object().get('/Subtype') == '/Image' for name in xobjects):
+            return False
+        contents = page.get_contents()
+        return contents is None or b'BT' not in contents.get_data()
+    except Exception:
+        return False
+
+
+def _extract_text_from_pdf_pypdf2(pdf_stream, skip_image_pages: bool = False) -> str:
+    """
+    Extract PDF text with PyPDF2 from a seekable binary stream.
+    
+    With skip_image_pages, pages that only draw images (scans) are skipped
+    without running text extraction on them.
+    """
+    _require(PyPDF2, 'PyPDF2')
+    reader = PyPDF2.PdfReader(pdf_stream)
+    page_texts = []
+    for page in reader.pages:
+        if skip_image_pages and _pdf_page_is_image_only(page):
+            continue
+        page_texts.append(page.extract_text() or "")
+    return "\n".join(page_texts).strip()
+
+
 def extract_text_from_pdf(file_content: bytes) -> str:
     """Extract text from PDF file"""
     try:
-        import PyPDF2
-        pdf_file = io.BytesIO(file_content)
-        reader = PyPDF2.PdfReader(pdf_file)
-        text = ""
-        for page in reader.pages:
-            text += page.extract_text() + "\n"
-        return text.strip()
+        if pdfium is not None:
+            return _extract_text_from_pdf_pdfium(file_content)
+        return _extract_text_from_pdf_pypdf2(
+            io.BytesIO(file_content),
+            skip_image_pages=len(file_content) > IMAGE_PAGE_SKIP_MIN_PDF_BYTES
+        )
+    except Exception as e:
+        logger.error(f"PDF extraction error: {e}")
+        return f"[Error extracting PDF: {str(e)}]"
+
+
+def extract_text_from_pdf_path(path: str) -> str:
+    """
+    Extract text from a PDF on disk without reading it fully into memory.
+    
+    PDFium reads the file itself; the PyPDF2 fallback parses a read-only mmap,
+    so the OS page cache streams the file instead of a bytes copy in RAM.
+    """
+    try:
+        if pdfium is not None:
+            return _extract_text_from_pdf_pdfium(path)
+        with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            return _extract_text_from_pdf_pypdf2(mm, skip_image_pages=len(mm) > IMAGE_PAGE_SKIP_MIN_PDF_BYTES)
     except Exception as e:
         logger.error(f"PDF extraction error: {e}")
         return f"[Error extracting PDF: {str(e)}]"
 
 
+_WORD_NS = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+
+
+def _extract_text_from_docx_xml(file_content: bytes) -> str:
+    """
+    Extract DOCX text by streaming word/document.xml directly.
+    
+    Concatenates the <w:t> runs of each <w:p> paragraph, clearing elements as
+    it goes so memory stays flat; skips python-docx's object model entirely.
+    """
+    paragraphs = []
+    with zipfile.ZipFile(io.BytesIO(file_content)) as docx_zip:
+        with docx_zip.open('word/document.xml') as xml_stream:
+            # Untrusted upload: no entity expansion, network access or huge-tree mode
+            # (python-docx's parser is set up the same way)
+            parser_events = _etree.iterparse(
+                xml_stream, tag=f'{_WORD_NS}p',
+                resolve_entities=False, no_network=True, huge_tree=False
+            )
+            for _, elem in parser_events:
+                paragraphs.append("".join(t.text or "" for t in elem.iter(f'{_WORD_NS}t')))
+                elem.clear()
+    return "\n".join(paragraphs).strip()
+
+
 def extract_text_from_docx(file_content: bytes) -> str:
     """Extract text from DOCX file"""
     try:
-        from docx import Document
+        if _etree is not None:
+            try:
+                return _extract_text_from_docx_xml(file_content)
+            except Exception as e:
+                logger.warning(f"DOCX XML scan failed ({e}), falling back to python-docx")
+        
+        _require(_DocxDocument, 'docx')
         doc_file = io.BytesIO(file_content)
-        doc = Document(doc_file)
+        doc = _DocxDocument(doc_file)
         text = "\n".join([paragraph.text for paragraph in doc.paragraphs])
         return text.strip()
     except Exception as e:
@@ -78,51 +305,96 @@ def extract_text_from_docx(file_content: bytes) -> str:
 def extract_text_from_xlsx(file_content: bytes) -> str:
     """Extract text from XLSX file"""
     try:
-        import openpyxl
+        _require(openpyxl, 'openpyxl')
         xlsx_file = io.BytesIO(file_content)
-        workbook = openpyxl.load_workbook(xlsx_file)
-        text = ""
-        for sheet_name in workbook.sheetnames:
-            sheet = workbook[sheet_name]
-            text += f"\n## Sheet: {sheet_name}\n"
-            for row in sheet.iter_rows(values_only=True):
-                row_text = " | ".join([str(cell) if cell is not None else "" for cell in row])
-                if row_text.strip():
-                    text += row_text + "\n"
-        return text.strip()
+        # read_only streams rows instead of building the full cell DOM;
+        # data_only returns cached formula results rather than formula strings
+        workbook = openpyxl.load_workbook(xlsx_file, read_only=True, data_only=True)
+        try:
+            parts = []
+            for sheet_name in workbook.sheetnames:
+                sheet = workbook[sheet_name]
+                parts.append(f"\n## Sheet: {sheet_name}\n")
+                for row in sheet.iter_rows(values_only=True):
+                    # str.join materializes its input anyway; a list comp skips the generator frames
+                    row_text = " | ".join(["" if cell is None else str(cell) for cell in row])
+                    if row_text.strip():
+                        parts.append(row_text + "\n")
+            return "".join(parts).strip()
+        finally:
+            workbook.close()
     except Exception as e:
         logger.error(f"XLSX extraction error: {e}")
         return f"[Error extracting XLSX: {str(e)}]"
 
 
+def _get_ocr_apis() -> queue.Queue:
+    """Lazily create the shared pool of PyTessBaseAPI handles"""
+    global _ocr_apis
+    with _ocr_apis_lock:
+        if _ocr_apis is None:
+            # Keep these handles single-threaded internally: parallelism comes from the
+            # OCR thread pool. OpenMP reads the limit when tesserocr's libraries load,
+            # so it is set only for the import and handle creation, not for the rest
+            # of the process or its children (e.g. pytesseract's tesseract runs)
+            previous_limit = os.environ.get('OMP_THREAD_LIMIT')
+            if previous_limit is None:
+                os.environ['OMP_THREAD_LIMIT'] = '1'
+            try:
+                import tesserocr
+                apis = queue.Queue()
+                for _ in range(OCR_POOL_SIZE):
+                    apis.put(tesserocr.PyTessBaseAPI(lang='eng'))
+            finally:
+                if previous_limit is None:
+                    os.environ.pop('OMP_THREAD_LIMIT', None)
+            _ocr_apis = apis
+    return _ocr_apis
+
+
 def extract_text_from_image_ocr(file_content: bytes) -> str:
     """Extract text from image using OCR (Tesseract)"""
     try:
-        from PIL import Image
-        import pytesseract
+        _require(Image, 'PIL')
         image = Image.open(io.BytesIO(file_content))
-        text = pytesseract.image_to_string(image)
+        if _HAS_TESSEROCR:
+            apis = _get_ocr_apis()
+            api = apis.get()
+            try:
+                api.SetImage(image)
+                text = api.GetUTF8Text()
+            finally:
+                apis.put(api)
+        else:
+            _require(pytesseract, 'pytesseract')
+            text = pytesseract.image_to_string(image)
         return text.strip()
     except Exception as e:
         logger.error(f"OCR extraction error: {e}")
         return f"[Error extracting text from image: {str(e)}. Note: Tesseract OCR may not be installed.]"
 
 
+def extract_text_from_images_ocr_batch(images: List[bytes]) -> List[str]:
+    """
+    OCR several images concurrently, returning texts in input order.
+    
+    Tesseract releases the GIL while recognizing, so a thread pool over the
+    shared API handles scales with cores.
+    """
+    if len(images) < 2:
+        return [extract_text_from_image_ocr(image) for image in images]
+    with ThreadPoolExecutor(max_workers=min(OCR_POOL_SIZE, len(images))) as executor:
+        return list(executor.map(extract_text_from_image_ocr, images))
+
+
 def encode_image_for_claude(file_content: bytes, file_type: str) -> Dict[str, Any]:
     """Encode image for Claude Vision API"""
     try:
         # Determine media type
-        media_type_map = {
-            'jpg': 'image/jpeg',
-            'jpeg': 'image/jpeg',
-            'png': 'image/png',
-            'gif': 'image/gif',
-            'webp': 'image/webp'
-        }
-        media_type = media_type_map.get(file_type.lower(), 'image/jpeg')
+        media_type = _MEDIA_TYPE_MAP.get(file_type.lower(), 'image/jpeg')
         
         # Encode to base64
-        base64_image = base64.standard_b64encode(file_content).decode('utf-8')
+        base64_image = _b64encode_str(file_content)
         
         return {
             'type': 'image',
@@ -137,7 +409,66 @@ def encode_image_for_claude(file_content: bytes, file_type: str) -> Dict[str, An
         return None
 
 
-def process_file(filename: str, file_content: bytes, use_vision_api: bool = False, max_chars_per_file: int = 100000) -> str:
+# process_file handlers, keyed by extension. Each takes
+# (filename, file_content, use_vision_api, max_chars, file_path) and returns text.
+def _handle_text(filename, file_content, use_vision_api, max_chars, file_path):
+    # Only decode the prefix that can survive truncation (UTF-8 is at most 4 bytes/char)
+    max_bytes = max_chars * 4
+    original_bytes = None
+    if len(file_content) > max_bytes:
+        # The full length is reported in bytes; counting characters would scan the whole file
+        original_bytes = len(file_content)
+        file_content = file_content[:max_bytes]
+    content = file_content.decode('utf-8', errors='ignore')
+    return truncate_content(content, max_chars, original_bytes)
+
+
+def _handle_pdf(filename, file_content, use_vision_api, max_chars, file_path):
+    if file_path:
+        content = extract_text_from_pdf_path(file_path)
+    else:
+        content = extract_text_from_pdf(file_content)
+    return truncate_content(content, max_chars)
+
+
+def _handle_docx(filename, file_content, use_vision_api, max_chars, file_path):
+    return truncate_content(extract_text_from_docx(file_content), max_chars)
+
+
+def _handle_xlsx(filename, file_content, use_vision_api, max_chars, file_path):
+    return truncate_content(extract_text_from_xlsx(file_content), max_chars)
+
+
+def _handle_image(filename, file_content, use_vision_api, max_chars, file_path):
+    if use_vision_api:
+        # Return special marker for vision API processing
+        return f"[IMAGE_FOR_VISION_API: {filename}]"
+    # Use OCR
+    ocr_text = extract_text_from_image_ocr(file_content)
+    content = f"### Image: {filename}\n[OCR Extracted Text]\n{ocr_text}"
+    return truncate_content(content, max_chars)
+
+
+def _unsupported(message: str):
+    return lambda *args: message
+
+
+_FILE_HANDLERS = {
+    'pdf': _handle_pdf,
+    'docx': _handle_docx,
+    'doc': _unsupported("[.DOC format not supported. Please convert to .DOCX]"),
+    'xlsx': _handle_xlsx,
+    'xls': _unsupported("[.XLS format not supported. Please convert to .XLSX]"),
+}
+for _ext in ('txt', 'md', 'csv', 'json', 'xml', 'log'):
+    _FILE_HANDLERS[_ext] = _handle_text
+for _ext in OCR_IMAGE_EXTENSIONS:
+    _FILE_HANDLERS[_ext] = _handle_image
+del _ext
+
+
+def process_file(filename: str, file_content: bytes, use_vision_api: bool = False, max_chars_per_file: int = 100000,
+                 file_path: Optional[str] = None) -> str:
     """
     Process any file type and extract text content
     
@@ -146,53 +477,20 @@ def process_file(filename: str, file_content: bytes, use_vision_api: bool = Fals
         file_content: Binary content of the file
         use_vision_api: If True, return image data for Claude Vision API instead of OCR
         max_chars_per_file: Maximum characters to extract per file (default 100k = ~25k tokens)
+        file_path: Optional path to the same content on disk; large PDFs are then
+            memory-mapped instead of parsed from the in-memory bytes
         
     Returns:
         Extracted text content or placeholder
     """
     try:
-        file_extension = Path(filename).suffix.lower().lstrip('.')
-        
-        # Text files - read directly
-        if file_extension in ['txt', 'md', 'csv', 'json', 'xml', 'log']:
-            content = file_content.decode('utf-8', errors='ignore')
-            return truncate_content(content, max_chars_per_file)
-        
-        # PDF files
-        elif file_extension == 'pdf':
-            content = extract_text_from_pdf(file_content)
-            return truncate_content(content, max_chars_per_file)
-        
-        # Word documents
-        elif file_extension in ['docx', 'doc']:
-            if file_extension == 'docx':
-                content = extract_text_from_docx(file_content)
-                return truncate_content(content, max_chars_per_file)
-            else:
-                return f"[.DOC format not supported. Please convert to .DOCX]"
-        
-        # Excel files
-        elif file_extension in ['xlsx', 'xls']:
-            if file_extension == 'xlsx':
-                content = extract_text_from_xlsx(file_content)
-                return truncate_content(content, max_chars_per_file)
-            else:
-                return f"[.XLS format not supported. Please convert to .XLSX]"
-        
-        # Image files
-        elif file_extension in ['png', 'jpg', 'jpeg', 'gif', 'webp', 'bmp']:
-            if use_vision_api:
-                # Return special marker for vision API processing
-                return f"[IMAGE_FOR_VISION_API: {filename}]"
-            else:
-                # Use OCR
-                ocr_text = extract_text_from_image_ocr(file_content)
-                content = f"### Image: {filename}\n[OCR Extracted Text]\n{ocr_text}"
-                return truncate_content(content, max_chars_per_file)
+        file_extension = _file_extension(filename)
         
-        # Unsupported formats
-        else:
+        handler = _FILE_HANDLERS.get(file_extension)
+        if handler is None:
+            # Unsupported formats
             return f"[{file_extension.upper()} Document: {filename}]"
+        return handler(filename, file_content, use_vision_api, max_chars_per_file, file_path)
             
     except Exception as e:
         logger.error(f"File processing error for {filename}: {e}")
@@ -228,7 +526,63 @@ def smart_truncate(content: str, max_chars: int, filename: str = "") -> str:
     
     truncation_notice = f"\n\n{'='*50}\n[INTELLIGENT TRUNCATION APPLIED]\nOriginal size: {len(content):,} characters\nShowing: {max_chars:,} characters\nDistribution: 50% beginning, 25% middle sample, 25% end\n{'='*50}\n\n"
     
-    return beginning + truncation_notice + "... [MIDDLE SECTION SAMPLE] ...\n\n" + middle + "\n\n... [END SECTION] ...\n\n" + end
+    return "".join([
+        beginning,
+        truncation_notice,
+        "... [MIDDLE SECTION SAMPLE] ...\n\n",
+        middle,
+        "\n\n... [END SECTION] ...\n\n",
+        end,
+    ])
+
+
+def _get_process_pool() -> ProcessPoolExecutor:
+    """
+    Lazily create the long-lived document extraction pool.
+    
+    Workers start from a forkserver (spawn where unavailable), never by forking
+    the multithreaded API process.
+    """
+    global _process_pool
+    with _process_pool_lock:
+        if _process_pool is None:
+            method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+            _process_pool = ProcessPoolExecutor(
+                max_workers=PROCESS_POOL_SIZE, mp_context=multiprocessing.get_context(method)
+            )
+    return _process_pool
+
+
+def _discard_process_pool(pool: ProcessPoolExecutor) -> None:
+    """Drop a broken pool so the next batch starts a fresh one"""
+    global _process_pool
+    with _process_pool_lock:
+        if _process_pool is pool:
+            _process_pool = None
+    pool.shutdown(wait=False)
+
+
+def _extract_one(filename: str, file_content: bytes, max_chars: int) -> str:
+    """Process-pool worker: extract text from a single file"""
+    return process_file(filename, file_content, use_vision_api=False, max_chars_per_file=max_chars)
+
+
+def _combine_file_sections(files: list) -> str:
+    """
+    Join files as '### name' sections separated by blank lines.
+    
+    Writes straight into one buffer so no per-file '### name\ncontent' strings
+    are built on the way.
+    """
+    buffer = io.StringIO()
+    for i, f in enumerate(files):
+        if i:
+            buffer.write("\n\n")
+        buffer.write("### ")
+        buffer.write(f['name'])
+        buffer.write("\n")
+        buffer.write(f['content'])
+    return buffer.getvalue()
 
 
 def process_files_intelligently(files_data: list) -> tuple:
@@ -249,14 +603,40 @@ def process_files_intelligently(files_data: list) -> tuple:
         return "", {}
     
     # First pass: Extract and measure all files
+    # Text extraction (PyPDF2/openpyxl/python-docx) is pure-Python and GIL-bound,
+    # so large multi-file batches are fanned out to the shared worker processes.
+    # Images go through the threaded OCR pool instead.
+    filenames = [file_data.get('name', 'unknown') for file_data in files_data]
+    contents = [file_data.get('content', b'') for file_data in files_data]
+    extracted_texts = [None] * len(files_data)
+    
+    ocr_indices = [i for i, name in enumerate(filenames)
+                   if _file_extension(name) in OCR_IMAGE_EXTENSIONS]
+    ocr_set = set(ocr_indices)
+    doc_indices = [i for i in range(len(files_data)) if i not in ocr_set]
+    
+    doc_names = [filenames[i] for i in doc_indices]
+    doc_contents = [contents[i] for i in doc_indices]
+    max_chars = [999999999] * len(doc_indices)
+    doc_texts = None
+    if len(doc_indices) >= 2 and sum(len(c) for c in doc_contents) >= PROCESS_POOL_MIN_TOTAL_BYTES:
+        pool = _get_process_pool()
+        try:
+            doc_texts = list(pool.map(_extract_one, doc_names, doc_contents, max_chars))
+        except BrokenProcessPool as e:
+            logger.warning(f"⚠️ Extraction worker pool failed ({e}), extracting in-process")
+            _discard_process_pool(pool)
+    if doc_texts is None:
+        doc_texts = list(map(_extract_one, doc_names, doc_contents, max_chars))
+    for i, text in zip(doc_indices, doc_texts):
+        extracted_texts[i] = text
+    
+    ocr_texts = extract_text_from_images_ocr_batch([contents[i] for i in ocr_indices])
+    for i, ocr_text in zip(ocr_indices, ocr_texts):
+        extracted_texts[i] = f"### Image: {filenames[i]}\n[OCR Extracted Text]\n{ocr_text}"
+    
     extracted_files = []
-    for file_data in files_data:
-        filename = file_data.get('name', 'unknown')
-        file_content_bytes = file_data.get('content', b'')
-        
-        # Extract text
-        extracted_text = process_file(filename, file_content_bytes, use_vision_api=False, max_chars_per_file=999999999)
-        
+    for filename, extracted_text in zip(filenames, extracted_texts):
         extracted_files.append({
             'name': filename,
             'content': extracted_text,
@@ -273,7 +653,7 @@ def process_files_intelligently(files_data: list) -> tuple:
     # If under limit, return everything
     if total_size <= MAX_TOTAL_CHARS:
         logger.info("✅ All files fit within token limit - no truncation needed")
-        combined = "\n\n".join([f"### {f['name']}\n{f['content']}" for f in extracted_files])
+        combined = _combine_file_sections(extracted_files)
         return combined, {
             'total_files': len(extracted_files),
             'total_chars': total_size,
@@ -333,7 +713,7 @@ def process_files_intelligently(files_data: list) -> tuple:
                 logger.info(f"  ⊘ {filename}: {size:,} chars (placeholder only)")
     
     # Combine all processed content
-    combined = "\n\n".join([f"### {f['name']}\n{f['content']}" for f in processed_files])
+    combined = _combine_file_sections(processed_files)
     
     metadata = {
         'total_files': len(extracted_files),
@@ -377,9 +757,9 @@ def process_files_with_vision(files_data: list) -> tuple:
     for file_data in files_data:
         filename = file_data.get('name', 'unknown')
         content = file_data.get('content', b'')
-        file_extension = Path(filename).suffix.lower().lstrip('.')
+        file_extension = _file_extension(filename)
         
-        if file_extension in ['png', 'jpg', 'jpeg', 'gif', 'webp']:
+        if file_extension in _MEDIA_TYPE_MAP:
             # This is an image
             # Check if content is already base64 string (from frontend) or bytes
             if isinstance(content, str):
@@ -395,62 +775,57 @@ def process_files_with_vision(files_data: list) -> tuple:
                 else:
                     logger.info(f"🖼️  {filename}: Using pre-encoded base64 from frontend")
                 
-                # Decode → resize → re-encode to reduce token consumption
+                # Clean base64 data FIRST - remove any whitespace (single pass, and
+                # skipped entirely for the usual whitespace-free payload)
+                if any(ch in base64_data for ch in _B64_WHITESPACE):
+                    base64_data = base64_data.translate(_B64_STRIP)
+                
+                # Single full decode; this is also the base64 validation
                 try:
-                    raw_bytes = base64.b64decode(base64_data)
-                    raw_bytes = resize_image_for_api(raw_bytes)
-                    base64_data = base64.standard_b64encode(raw_bytes).decode('utf-8')
-                    logger.info(f"🖼️  {filename}: Resized and re-encoded image from frontend")
-                except Exception as resize_err:
-                    logger.warning(f"⚠️  {filename}: Could not resize frontend image: {resize_err}, using original")
+                    raw_bytes = _b64.b64decode(base64_data, validate=True)
+                except Exception as decode_err:
+                    logger.error(f"❌ {filename}: Invalid base64 data - {decode_err}")
+                    logger.error(f"   First 100 chars: '{base64_data[:100]}'")
+                    continue
             else:
-                # Binary bytes - resize then encode
-                content = resize_image_for_api(content)
-                base64_data = base64.standard_b64encode(content).decode('utf-8')
-                logger.info(f"🖼️  {filename}: Resized and encoded binary to base64")
+                raw_bytes = content
+                base64_data = None
             
-            # Validate base64 data
-            if not base64_data or len(base64_data.strip()) == 0:
-                logger.error(f"❌ {filename}: Empty base64 data, skipping")
+            # Validate image data
+            if not raw_bytes:
+                logger.error(f"❌ {filename}: Empty image data, skipping")
                 continue
             
-            # Clean base64 data FIRST - remove any whitespace
-            base64_data = base64_data.strip().replace('\n', '').replace('\r', '').replace(' ', '')
-            
-            # Validate that base64 can be decoded
+            # Validate it's actually an image. load() decodes the pixel data once
+            # (catching truncated/corrupt files) and the resize below reuses it.
             try:
-                test_decode = base64.b64decode(base64_data, validate=True)
-                actual_size = len(test_decode)
-                logger.info(f"✓ {filename}: Valid base64, decoded to {actual_size / 1024:.1f}KB")
-            except Exception as decode_err:
-                logger.error(f"❌ {filename}: Invalid base64 data - {decode_err}")
-                logger.error(f"   First 100 chars: '{base64_data[:100]}'")
+                _require(Image, 'PIL')
+                img = Image.open(io.BytesIO(raw_bytes))
+                img.load()
+                logger.info(f"✓ {filename}: Valid {img.format} image, {img.size[0]}x{img.size[1]}px")
+            except Exception as img_err:
+                logger.error(f"❌ {filename}: Not a valid image file - {img_err}")
                 continue
             
-            # Check actual decoded image size
+            # Resize; the frontend's base64 is reused unless the bytes changed
+            resized_bytes = resize_image_for_api(raw_bytes, img=img)
+            if resized_bytes is not raw_bytes:
+                raw_bytes = resized_bytes
+                base64_data = None
+            
+            actual_size = len(raw_bytes)
+            
+            # Check actual decoded image size (before encoding, so rejected images are never encoded)
             if actual_size > MAX_IMAGE_SIZE_BYTES:
                 logger.warning(f"⚠️  {filename}: Image too large ({actual_size / 1024 / 1024:.1f}MB > {MAX_IMAGE_SIZE_MB}MB), skipping")
                 continue
             
-            # Validate it's actually an image by checking header
-            try:
-                from PIL import Image
-                img = Image.open(io.BytesIO(test_decode))
-                img.verify()
-                logger.info(f"✓ {filename}: Valid {img.format} image, {img.size[0]}x{img.size[1]}px")
-            except Exception as img_err:
-                logger.error(f"❌ {filename}: Not a valid image file - {img_err}")
-                continue
+            if base64_data is None:
+                base64_data = _b64encode_str(raw_bytes)
+                logger.info(f"🖼️  {filename}: Encoded image to base64")
             
             # Determine media type
-            media_type_map = {
-                'jpg': 'image/jpeg',
-                'jpeg': 'image/jpeg',
-                'png': 'image/png',
-                'gif': 'image/gif',
-                'webp': 'image/webp'
-            }
-            media_type = media_type_map.get(file_extension.lower(), 'image/jpeg')
+            media_type = _MEDIA_TYPE_MAP[file_extension]
             
             # Log image details
             logger.info(f"📷 {filename}: {media_type}, {actual_size / 1024:.1f}KB, base64 length: {len(base64_data)}")
@@ -490,11 +865,14 @@ def process_files_with_vision(files_data: list) -> tuple:
     return text_content, image_files, metadata
 
 
-def truncate_content(content: str, max_chars: int) -> str:
+def truncate_content(content: str, max_chars: int, original_bytes: Optional[int] = None) -> str:
     """
     Truncate content to stay within character limits
+    
+    original_bytes: full size (in bytes) to report when `content` is only a decoded prefix of the original
     """
     if len(content) > max_chars:
         truncated = content[:max_chars]
-        return f"{truncated}\n\n... [Content truncated - Original: {len(content):,} chars, Showing: {max_chars:,} chars]"
+        original = f"{original_bytes:,} bytes" if original_bytes is not None else f"{len(content):,} chars"
+        return f"{truncated}\n\n... [Content truncated - Original: {original}, Showing: {max_chars:,} chars]"
     return content
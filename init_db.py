@@ -12,7 +12,7 @@ from datetime import datetime
 # Add parent directory to path for imports
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
-from database import SessionLocal, init_db, engine
+from database import SessionLocal, init_db, engine, upgrade_schema
 from models import Organization, User, APIKey, Base
 from auth import PasswordAuth
 
@@ -62,6 +62,7 @@ def create_tables():
     
     # Apply missing columns migration if needed
     apply_migration_if_needed()
+    upgrade_schema()
 
 
 def seed_initial_data():
@@ -4,12 +4,13 @@ Multi-tenancy, User management, API keys, and Audit logging
 """
 
 from datetime import datetime
-from typing import Optional, List
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Boolean, Text, JSON, Float
+from typing import Optional, List, Union
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Boolean, Text, JSON, Float, Index, Computed
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 import hashlib
+import hmac
 import secrets
 
 Base = declarative_base()
@@ -93,7 +94,8 @@ class APIKey(Base):
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String(255), nullable=False)  # Descriptive name for the key
     key_prefix = Column(String(20), nullable=False, index=True)  # First 8 chars for display
-    key_hash = Column(String(255), nullable=False, unique=True, index=True)  # SHA256 hash
+    key_hash = Column(String(255), nullable=False, unique=True, index=True)  # Hex digest, scheme per hash_version
+    hash_version = Column(Integer, nullable=False, default=2)  # 1 = SHA256 (legacy), 2 = BLAKE2b-256
     
     # Permissions
     scopes = Column(JSON)  # ["threat_modeling:read", "threat_modeling:write", "admin:users"]
@@ -117,6 +119,8 @@ class APIKey(Base):
     # Relationships
     api_usage_logs = relationship("APIUsageLog", back_populates="api_key", cascade="all, delete-orphan")
     
+    HASH_VERSION = 2  # Scheme used for new keys and upgrades
+    
     @staticmethod
     def generate_key():
         """Generate a new API key"""
@@ -124,13 +128,41 @@ class APIKey(Base):
         return key
     
     @staticmethod
-    def hash_key(key: str) -> str:
-        """Hash an API key for storage"""
-        return hashlib.sha256(key.encode()).hexdigest()
+    def hash_key(key: Union[str, bytes]) -> str:
+        """Hash an API key for storage (BLAKE2b-256; keys are random, so no password hashing needed)"""
+        key_bytes = key if isinstance(key, bytes) else key.encode()
+        return hashlib.blake2b(key_bytes, digest_size=32).hexdigest()
     
-    def verify_key(self, key: str) -> bool:
-        """Verify an API key against the stored hash"""
-        return self.key_hash == self.hash_key(key)
+    @staticmethod
+    def legacy_hash_key(key: Union[str, bytes]) -> str:
+        """SHA256 hash used for API keys created before the switch to BLAKE2b"""
+        key_bytes = key if isinstance(key, bytes) else key.encode()
+        return hashlib.sha256(key_bytes).hexdigest()
+    
+    @classmethod
+    def hash_key_version(cls, key: Union[str, bytes], version: int) -> str:
+        """Hash an API key with the scheme identified by `version`"""
+        if version == 1:
+            return cls.legacy_hash_key(key)
+        return cls.hash_key(key)
+    
+    @classmethod
+    def candidate_hashes(cls, key: Union[str, bytes]) -> tuple:
+        """All stored-hash forms an API key may have, for lookups (current scheme first)"""
+        key_bytes = key if isinstance(key, bytes) else key.encode()
+        return (cls.hash_key(key_bytes), cls.legacy_hash_key(key_bytes))
+    
+    def verify_key(self, key: Union[str, bytes]) -> bool:
+        """Verify an API key against the stored hash, using the key's hash_version"""
+        return hmac.compare_digest(self.key_hash, self.hash_key_version(key, self.hash_version or 1))
+    
+    def upgrade_hash(self, key: Union[str, bytes]) -> bool:
+        """Re-hash a verified key with the current scheme; True if the row changed"""
+        if (self.hash_version or 1) >= self.HASH_VERSION:
+            return False
+        self.key_hash = self.hash_key(key)
+        self.hash_version = self.HASH_VERSION
+        return True
     
     def __repr__(self):
         return f"<APIKey(id={self.id}, prefix='{self.key_prefix}', name='{self.name}')>"
@@ -139,6 +171,12 @@ class APIKey(Base):
 class AuditLog(Base):
     """Audit log model for tracking all user actions"""
     __tablename__ = 'audit_logs'
+    # On PostgreSQL this table is partitioned by month on timestamp (see partition_maintenance.py)
+    __table_args__ = (
+        # Dashboards filter by org and sort by time; these also cover organization_id lookups
+        Index('ix_audit_org_ts', 'organization_id', 'timestamp'),
+        Index('ix_audit_org_action_ts', 'organization_id', 'action', 'timestamp'),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     
@@ -147,7 +185,7 @@ class AuditLog(Base):
     user = relationship("User", back_populates="audit_logs")
     user_email = Column(String(255))  # Denormalized for reporting
     
-    organization_id = Column(Integer, ForeignKey('organizations.id'), nullable=False, index=True)
+    organization_id = Column(Integer, ForeignKey('organizations.id'), nullable=False)  # Indexed via ix_audit_org_ts
     organization = relationship("Organization", back_populates="audit_logs")
     
     # What
@@ -177,11 +215,16 @@ class AuditLog(Base):
 class APIUsageLog(Base):
     """API usage tracking for rate limiting and analytics"""
     __tablename__ = 'api_usage_logs'
+    # On PostgreSQL this table is partitioned by month on timestamp (see partition_maintenance.py)
+    __table_args__ = (
+        # Per-key usage over a time window (rate limiting / analytics)
+        Index('ix_api_usage_key_ts', 'api_key_id', 'timestamp'),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     
     # API Key
-    api_key_id = Column(Integer, ForeignKey('api_keys.id'), nullable=False, index=True)
+    api_key_id = Column(Integer, ForeignKey('api_keys.id'), nullable=False)  # Indexed via ix_api_usage_key_ts
     api_key = relationship("APIKey", back_populates="api_usage_logs")
     
     # Request details
@@ -201,14 +244,32 @@ class APIUsageLog(Base):
         return f"<APIUsageLog(id={self.id}, endpoint='{self.endpoint}', key_id={self.api_key_id})>"
 
 
+def _risk_count_sql(level: str) -> str:
+    """SQL counting occurrences of `level` in the upper-cased report (same as str.count)"""
+    return (
+        f"(LENGTH(UPPER(assessment_report)) - "
+        f"LENGTH(REPLACE(UPPER(assessment_report), '{level}', ''))) / {len(level)}"
+    )
+
+
 class ThreatAssessment(Base):
     """Threat assessment records for tracking and analytics"""
     __tablename__ = 'threat_assessments'
+    __table_args__ = (
+        # Org assessment lists, filtered by status and newest first
+        Index('ix_ta_org_status_created', 'organization_id', 'status', 'created_at'),
+        # Covering index for the reports list (org, newest first): index-only scans on PostgreSQL
+        Index(
+            'ix_ta_org_created_covering', 'organization_id', 'created_at',
+            postgresql_include=['id', 'project_name', 'project_number', 'framework', 'status',
+                                'critical_count', 'high_count', 'medium_count']
+        ),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     
     # Organization and user
-    organization_id = Column(Integer, ForeignKey('organizations.id'), nullable=False, index=True)
+    organization_id = Column(Integer, ForeignKey('organizations.id'), nullable=False)  # Indexed via ix_ta_org_status_created
     organization = relationship("Organization", back_populates="threat_assessments")
     
     user_id = Column(Integer, ForeignKey('users.id'), nullable=False, index=True)
@@ -226,10 +287,10 @@ class ThreatAssessment(Base):
     report_html = Column(Text)  # HTML version
     report_meta = Column(JSON)  # Risk scores, counts, etc.
     
-    # Risk count cache (computed once, stored for fast retrieval)
-    critical_count = Column(Integer, default=0)
-    high_count = Column(Integer, default=0)
-    medium_count = Column(Integer, default=0)
+    # Risk counts: stored generated columns the database derives from assessment_report
+    critical_count = Column(Integer, Computed(_risk_count_sql('CRITICAL'), persisted=True))
+    high_count = Column(Integer, Computed(_risk_count_sql('HIGH'), persisted=True))
+    medium_count = Column(Integer, Computed(_risk_count_sql('MEDIUM'), persisted=True))
     
     # Files
     uploaded_files = Column(JSON)  # List of uploaded file names
@@ -0,0 +1,145 @@
+"""
+Monthly range partitioning for the append-only log tables (PostgreSQL only)
+
+audit_logs and api_usage_logs are partitioned by month on `timestamp`
+(partitions named <table>_YYYY_MM, plus a <table>_default catch-all).
+run_migration.py converts existing tables once; run this module nightly
+(e.g. cron: `python partition_maintenance.py`) to create upcoming months'
+partitions and detach months older than LOG_RETENTION_MONTHS.
+"""
+
+import os
+from datetime import datetime
+from typing import List
+
+from sqlalchemy import text
+
+PARTITIONED_LOG_TABLES = ('audit_logs', 'api_usage_logs')
+
+# Detached (not dropped) after this many months; 0 keeps everything
+LOG_RETENTION_MONTHS = int(os.getenv("LOG_RETENTION_MONTHS", "0"))
+
+
+def _month_start(value: datetime) -> datetime:
+    return datetime(value.year, value.month, 1)
+
+
+def _add_months(value: datetime, months: int) -> datetime:
+    month_index = value.year * 12 + value.month - 1 + months
+    return datetime(month_index // 12, month_index % 12 + 1, 1)
+
+
+def _partition_name(table: str, month: datetime) -> str:
+    return f"{table}_{month.year:04d}_{month.month:02d}"
+
+
+def is_partitioned(conn, table: str) -> bool:
+    """True if `table` is already a partitioned (parent) table"""
+    result = conn.execute(text("SELECT relkind FROM pg_class WHERE relname = :table"), {"table": table})
+    row = result.fetchone()
+    return row is not None and row[0] == 'p'
+
+
+def ensure_month_partitions(conn, table: str, start: datetime, end: datetime) -> List[str]:
+    """Create monthly partitions covering start..end (inclusive months); returns the ones created"""
+    created = []
+    month = _month_start(start)
+    while month <= end:
+        name = _partition_name(table, month)
+        exists = conn.execute(text("SELECT 1 FROM pg_class WHERE relname = :name"), {"name": name}).fetchone()
+        if not exists:
+            conn.execute(text(f"""
+                CREATE TABLE {name} PARTITION OF {table}
+                FOR VALUES FROM ('{month:%Y-%m-%d}') TO ('{_add_months(month, 1):%Y-%m-%d}')
+            """))
+            created.append(name)
+        month = _add_months(month, 1)
+    return created
+
+
+def detach_old_partitions(conn, table: str, retention_months: int) -> List[str]:
+    """Detach monthly partitions that ended before the retention window; returns their names"""
+    if retention_months <= 0:
+        return []
+    cutoff = _add_months(_month_start(datetime.utcnow()), -retention_months)
+    result = conn.execute(text("""
+        SELECT child.relname
+        FROM pg_inherits
+        JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+        JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+        WHERE parent.relname = :table
+    """), {"table": table})
+    detached = []
+    prefix = f"{table}_"
+    for (name,) in result.fetchall():
+        suffix = name[len(prefix):]
+        try:
+            month = datetime.strptime(suffix, "%Y_%m")
+        except ValueError:
+            continue  # default partition or foreign naming
+        if month < cutoff:
+            conn.execute(text(f"ALTER TABLE {table} DETACH PARTITION {name}"))
+            detached.append(name)
+    return detached
+
+
+def partition_log_table(conn, table: str, model, months_ahead: int = 1) -> None:
+    """
+    Convert an existing (unpartitioned) log table into a monthly-partitioned one.
+
+    Rows are copied into the new table; the id sequence is kept, the primary key
+    becomes (id, timestamp) as PostgreSQL requires, and the model's indexes are
+    recreated on the partitioned parent (and so on every partition).
+    """
+    old = f"{table}_unpartitioned"
+    conn.execute(text(f"ALTER TABLE {table} RENAME TO {old}"))
+    conn.execute(text(f"""
+        CREATE TABLE {table} (LIKE {old} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)
+        PARTITION BY RANGE (timestamp)
+    """))
+    conn.execute(text(f"ALTER TABLE {table} ADD PRIMARY KEY (id, timestamp)"))
+    for fk in model.__table__.foreign_keys:
+        conn.execute(text(f"""
+            ALTER TABLE {table} ADD FOREIGN KEY ({fk.parent.name})
+            REFERENCES {fk.column.table.name} ({fk.column.name})
+        """))
+
+    # Partitions for the existing data range through the coming months, plus a catch-all
+    oldest = conn.execute(text(f"SELECT MIN(timestamp) FROM {old}")).scalar() or datetime.utcnow()
+    ensure_month_partitions(conn, table, oldest, _add_months(_month_start(datetime.utcnow()), months_ahead))
+    conn.execute(text(f"CREATE TABLE {table}_default PARTITION OF {table} DEFAULT"))
+
+    conn.execute(text(f"INSERT INTO {table} SELECT * FROM {old}"))
+
+    # Keep the id sequence alive when the old table (its current owner) is dropped
+    sequence = conn.execute(text("SELECT pg_get_serial_sequence(:old, 'id')"), {"old": old}).scalar()
+    if sequence:
+        conn.execute(text(f"ALTER SEQUENCE {sequence} OWNED BY {table}.id"))
+    conn.execute(text(f"DROP TABLE {old}"))
+
+    for index in model.__table__.indexes:
+        index.create(conn)
+
+
+def run_maintenance(conn, months_ahead: int = 1, retention_months: int = LOG_RETENTION_MONTHS) -> None:
+    """Create upcoming partitions and detach expired ones for every partitioned log table"""
+    this_month = _month_start(datetime.utcnow())
+    for table in PARTITIONED_LOG_TABLES:
+        if not is_partitioned(conn, table):
+            print(f"⚠️ {table} is not partitioned; run run_migration.py first")
+            continue
+        for name in ensure_month_partitions(conn, table, this_month, _add_months(this_month, months_ahead)):
+            print(f"✓ Created partition '{name}'")
+        for name in detach_old_partitions(conn, table, retention_months):
+            print(f"✓ Detached partition '{name}'")
+
+
+if __name__ == "__main__":
+    from database import engine
+
+    if engine.dialect.name != 'postgresql':
+        print("Partition maintenance only applies to PostgreSQL; nothing to do.")
+    else:
+        with engine.connect() as conn:
+            run_maintenance(conn)
+            conn.commit()
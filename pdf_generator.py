@@ -6,6 +6,7 @@ Uses ReportLab for pure Python PDF generation
 import io
 import re
 from datetime import datetime
+from typing import BinaryIO, Iterator
 from reportlab.lib.pagesizes import letter
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import inch
@@ -13,6 +14,133 @@ from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, Tabl
 from reportlab.lib import colors
 from reportlab.lib.enums import TA_LEFT, TA_CENTER, TA_JUSTIFY
 
+# Chunk size iter_pdf yields to HTTP streaming responses
+PDF_CHUNK_SIZE = 64 * 1024
+
+# Markdown → ReportLab markup patterns, compiled once
+_RE_TABLE_SEP = re.compile(r'^[\|\s\-:]+$')
+
+# Emoji stripped from report text, as str.translate delete tables (code points,
+# so multi-code-point emoji like ⚠️ drop their variation selector too)
+_EMOJI_TABLE = dict.fromkeys(map(ord, '🔴🟠🟡🟢🔵⚪🎯⚠️✅❌📊🔍🛡️📝🔐💡'))
+_H1_EMOJI_TABLE = dict.fromkeys(map(ord, '🛡️🔍📊'))
+_H2_EMOJI_TABLE = dict.fromkeys(map(ord, '🎯⚠️✅'))
+_H3_EMOJI_TABLE = dict.fromkeys(map(ord, '🔴🟠🟡'))
+
+# Risk level / priority highlighting: one alternation, colour looked up per match
+_RISK_COLORS = {
+    'CRITICAL': '#dc2626',
+    'HIGH': '#ea580c',
+    'MEDIUM': '#ca8a04',
+    'LOW': '#16a34a',
+    'P0': '#dc2626',
+    'P1': '#ea580c',
+    'P2': '#ca8a04',
+}
+_RISK_ALTERNATION = '|'.join(_RISK_COLORS)
+
+# Inline markdown (bold, italic, code, risk level) in one scan; the group that
+# matched picks the rewrite, and bold/italic/code contents are formatted recursively.
+# Italic spans may contain **bold** spans (as when bold was substituted first).
+_INLINE_RE = re.compile(
+    r'\*\*(.+?)\*\*|\*((?:\*\*.+?\*\*|[^*])+?)\*(?!\*)|`(.+?)`|\b(' + _RISK_ALTERNATION + r')\b'
+)
+# Table cells: empty bold/italic allowed, backticks already removed, and only
+# risk levels (not priorities) are highlighted
+_CELL_INLINE_RE = re.compile(r'\*\*(.*?)\*\*|\*((?:\*\*.*?\*\*|[^*])*?)\*(?!\*)|\b(CRITICAL|HIGH|MEDIUM|LOW)\b')
+
+
+def _risk_font(level):
+    return f'<font color="{_RISK_COLORS[level]}"><b>{level}</b></font>'
+
+
+def _format_inline(match):
+    bold, italic, code, level = match.groups()
+    if bold is not None:
+        return f'<b>{_INLINE_RE.sub(_format_inline, bold)}</b>'
+    if italic is not None:
+        return f'<i>{_INLINE_RE.sub(_format_inline, italic)}</i>'
+    if code is not None:
+        return f'<font face="Courier" size="8">{_INLINE_RE.sub(_format_inline, code)}</font>'
+    return _risk_font(level)
+
+
+def _format_cell_inline(match):
+    bold, italic, level = match.groups()
+    if bold is not None:
+        return f'<b>{_CELL_INLINE_RE.sub(_format_cell_inline, bold)}</b>'
+    if italic is not None:
+        return f'<i>{_CELL_INLINE_RE.sub(_format_cell_inline, italic)}</i>'
+    return _risk_font(level)
+
+
+# Table cell paragraph styles, shared by every table
+_STYLES = getSampleStyleSheet()
+_CELL_STYLE = ParagraphStyle(
+    'CellStyle',
+    parent=_STYLES['Normal'],
+    fontSize=7,
+    leading=9,
+    alignment=TA_LEFT
+)
+_HEADER_STYLE = ParagraphStyle('HeaderStyle', parent=_CELL_STYLE, fontSize=7, fontName='Helvetica-Bold', alignment=TA_CENTER)
+
+
+# Table style shared by every table (setStyle copies the commands into the table)
+_TABLE_STYLE = TableStyle([
+    # Header row
+    ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#1e40af')),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, 0), 9),
+    ('BOTTOMPADDING', (0, 0), (-1, 0), 8),
+    ('TOPPADDING', (0, 0), (-1, 0), 8),
+    
+    # Data rows
+    ('BACKGROUND', (0, 1), (-1, -1), colors.white),
+    ('TEXTCOLOR', (0, 1), (-1, -1), colors.black),
+    ('ALIGN', (0, 1), (-1, -1), 'LEFT'),
+    ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+    ('FONTSIZE', (0, 1), (-1, -1), 8),
+    ('TOPPADDING', (0, 1), (-1, -1), 5),
+    ('BOTTOMPADDING', (0, 1), (-1, -1), 5),
+    ('LEFTPADDING', (0, 0), (-1, -1), 6),
+    ('RIGHTPADDING', (0, 0), (-1, -1), 6),
+    
+    # Grid
+    ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+    ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+    
+    # Alternating row colors
+    ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#f8fafc')]),
+])
+
+
+def _iter_lines(text):
+    """Yield the lines of text one slice at a time (no StringIO/split copy of the whole report)"""
+    pos = 0
+    while True:
+        end = text.find('\n', pos)
+        if end == -1:
+            yield text[pos:]
+            return
+        yield text[pos:end]
+        pos = end + 1
+
+
+def _clean_row(cells, is_header=False):
+    """Convert one row of markdown cells into wrapped Paragraphs"""
+    style = _HEADER_STYLE if is_header else _CELL_STYLE
+    cleaned_row = []
+    for cell in cells:
+        # Convert markdown formatting and color risk levels
+        cell_text = _CELL_INLINE_RE.sub(_format_cell_inline, str(cell).replace('`', ''))
+        
+        # Wrap in Paragraph for better text handling (header row bold and centered)
+        cleaned_row.append(Paragraph(cell_text, style))
+    return cleaned_row
+
 
 def create_reportlab_table(table_data):
     """Create a ReportLab Table object from table data"""
@@ -20,39 +148,14 @@ def create_reportlab_table(table_data):
         return None
     
     # Clean cells and wrap in Paragraphs for better text wrapping
-    from reportlab.lib.styles import getSampleStyleSheet
-    styles = getSampleStyleSheet()
-    cell_style = ParagraphStyle(
-        'CellStyle',
-        parent=styles['Normal'],
-        fontSize=7,
-        leading=9,
-        alignment=TA_LEFT
-    )
-    
-    cleaned_data = []
-    for row_idx, row in enumerate(table_data):
-        cleaned_row = []
-        for cell in row:
-            # Remove markdown formatting
-            cell_text = re.sub(r'\*\*(.*?)\*\*', r'<b>\1</b>', str(cell))
-            cell_text = re.sub(r'\*(.*?)\*', r'<i>\1</i>', cell_text)
-            cell_text = cell_text.replace('`', '')
-            
-            # Apply color to risk levels
-            cell_text = re.sub(r'\b(CRITICAL)\b', r'<font color="#dc2626"><b>\1</b></font>', cell_text)
-            cell_text = re.sub(r'\b(HIGH)\b', r'<font color="#ea580c"><b>\1</b></font>', cell_text)
-            cell_text = re.sub(r'\b(MEDIUM)\b', r'<font color="#ca8a04"><b>\1</b></font>', cell_text)
-            cell_text = re.sub(r'\b(LOW)\b', r'<font color="#16a34a"><b>\1</b></font>', cell_text)
-            
-            # Wrap in Paragraph for better text handling
-            if row_idx == 0:
-                # Header row - bold and centered
-                header_style = ParagraphStyle('HeaderStyle', parent=cell_style, fontSize=7, fontName='Helvetica-Bold', alignment=TA_CENTER)
-                cleaned_row.append(Paragraph(cell_text, header_style))
-            else:
-                cleaned_row.append(Paragraph(cell_text, cell_style))
-        cleaned_data.append(cleaned_row)
+    cleaned_data = [_clean_row(row, is_header=(row_idx == 0)) for row_idx, row in enumerate(table_data)]
+    return _build_table(cleaned_data)
+
+
+def _build_table(cleaned_data):
+    """Create a ReportLab Table object from rows already wrapped by _clean_row"""
+    if not cleaned_data:
+        return None
     
     # Determine column count and set dynamic widths
     num_cols = len(cleaned_data[0]) if cleaned_data else 0
@@ -73,47 +176,32 @@ def create_reportlab_table(table_data):
     # Create table with column widths
     table = Table(cleaned_data, colWidths=col_widths, repeatRows=1)
     
-    # Style table
-    style = TableStyle([
-        # Header row
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#1e40af')),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 9),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 8),
-        ('TOPPADDING', (0, 0), (-1, 0), 8),
-        
-        # Data rows
-        ('BACKGROUND', (0, 1), (-1, -1), colors.white),
-        ('TEXTCOLOR', (0, 1), (-1, -1), colors.black),
-        ('ALIGN', (0, 1), (-1, -1), 'LEFT'),
-        ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-        ('FONTSIZE', (0, 1), (-1, -1), 8),
-        ('TOPPADDING', (0, 1), (-1, -1), 5),
-        ('BOTTOMPADDING', (0, 1), (-1, -1), 5),
-        ('LEFTPADDING', (0, 0), (-1, -1), 6),
-        ('RIGHTPADDING', (0, 0), (-1, -1), 6),
-        
-        # Grid
-        ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
-        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-        
-        # Alternating row colors
-        ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#f8fafc')]),
-    ])
-    
-    table.setStyle(style)
+    table.setStyle(_TABLE_STYLE)
     return table
 
 
 def generate_pdf(report_content: str, project_name: str, framework: str = "MITRE ATT&CK") -> bytes:
     """Generate a professional PDF from markdown threat assessment report"""
-    
-    # Create PDF buffer
     buffer = io.BytesIO()
+    generate_pdf_to(buffer, report_content, project_name, framework)
+    return buffer.getvalue()
+
+
+def iter_pdf(report_content: str, project_name: str, framework: str = "MITRE ATT&CK",
+             chunk_size: int = PDF_CHUNK_SIZE) -> Iterator[bytes]:
+    """Yield the PDF in chunks (for StreamingResponse) without copying the whole document out"""
+    buffer = io.BytesIO()
+    generate_pdf_to(buffer, report_content, project_name, framework)
+    with buffer.getbuffer() as view:
+        for start in range(0, len(view), chunk_size):
+            yield bytes(view[start:start + chunk_size])
+
+
+def generate_pdf_to(stream: BinaryIO, report_content: str, project_name: str,
+                    framework: str = "MITRE ATT&CK") -> None:
+    """Write a professional PDF from markdown threat assessment report to a binary file-like `stream`"""
     doc = SimpleDocTemplate(
-        buffer, 
+        stream, 
         pagesize=letter, 
         topMargin=0.75*inch, 
         bottomMargin=0.75*inch,
@@ -199,60 +287,59 @@ def generate_pdf(report_content: str, project_name: str, framework: str = "MITRE
     story.append(Paragraph("<i>This report contains a comprehensive threat analysis based on industry-standard security frameworks and AI-powered assessment.</i>", body_style))
     story.append(Spacer(1, 0.5*inch))
     
-    # Parse markdown content
-    lines = report_content.split('\n')
+    # Parse markdown content, streaming lines rather than materializing a split list.
+    # current_table holds rows already cleaned by _clean_row, so periodic flushes
+    # of long tables don't re-process earlier rows.
     current_table = []
+    table_header = []
     in_table = False
     
-    i = 0
-    while i < len(lines):
-        line = lines[i].strip()
+    for raw_line in _iter_lines(report_content):
+        line = raw_line.strip()
         
         # Skip table separator lines (---|---|---)
-        if re.match(r'^[\|\s\-:]+$', line) and '|' in line:
-            i += 1
+        if _RE_TABLE_SEP.match(line) and '|' in line:
             continue
         
         # Empty lines
         if not line:
             if not in_table:
                 story.append(Spacer(1, 0.1*inch))
-            i += 1
             continue
         
         # Headers
         if line.startswith('# ') and not line.startswith('## '):
             if current_table:
-                table_element = create_reportlab_table(current_table)
+                table_element = _build_table(current_table)
                 if table_element:
                     story.append(table_element)
                     story.append(Spacer(1, 0.15*inch))
                 current_table = []
                 in_table = False
-            content = line[2:].replace('🛡️', '').replace('🔍', '').replace('📊', '').strip()
+            content = line[2:].translate(_H1_EMOJI_TABLE).strip()
             story.append(Spacer(1, 0.2*inch))
             story.append(Paragraph(content, heading1_style))
             
         elif line.startswith('## ') and not line.startswith('### '):
             if current_table:
-                table_element = create_reportlab_table(current_table)
+                table_element = _build_table(current_table)
                 if table_element:
                     story.append(table_element)
                     story.append(Spacer(1, 0.12*inch))
                 current_table = []
                 in_table = False
-            content = line[3:].replace('🎯', '').replace('⚠️', '').replace('✅', '').strip()
+            content = line[3:].translate(_H2_EMOJI_TABLE).strip()
             story.append(Paragraph(content, heading2_style))
             
         elif line.startswith('### '):
             if current_table:
-                table_element = create_reportlab_table(current_table)
+                table_element = _build_table(current_table)
                 if table_element:
                     story.append(table_element)
                     story.append(Spacer(1, 0.1*inch))
                 current_table = []
                 in_table = False
-            content = line[4:].replace('🔴', '').replace('🟠', '').replace('🟡', '').strip()
+            content = line[4:].translate(_H3_EMOJI_TABLE).strip()
             story.append(Paragraph(content, heading3_style))
         
         # Table rows
@@ -260,58 +347,43 @@ def generate_pdf(report_content: str, project_name: str, framework: str = "MITRE
             in_table = True
             cells = [cell.strip() for cell in line.split('|') if cell.strip()]
             if cells:
-                current_table.append(cells)
+                if not current_table:
+                    table_header = cells
+                current_table.append(_clean_row(cells, is_header=not current_table))
                 # Add page break hint for very long tables (>15 rows)
                 if len(current_table) > 15 and len(current_table) % 15 == 0:
-                    table_element = create_reportlab_table(current_table)
+                    table_element = _build_table(current_table)
                     if table_element:
                         story.append(table_element)
                         story.append(PageBreak())
-                    current_table = [current_table[0]]  # Keep header for next page
+                    # Keep header for next page (fresh Paragraphs; flowables aren't shared between tables)
+                    current_table = [_clean_row(table_header, is_header=True)]
         
         # Regular text
         else:
             if in_table and current_table:
-                table_element = create_reportlab_table(current_table)
+                table_element = _build_table(current_table)
                 if table_element:
                     story.append(table_element)
                     story.append(Spacer(1, 0.12*inch))
                 current_table = []
                 in_table = False
             
-            # Format inline markdown
-            line = re.sub(r'\*\*(.+?)\*\*', r'<b>\1</b>', line)
-            line = re.sub(r'\*(.+?)\*', r'<i>\1</i>', line)
-            line = re.sub(r'`(.+?)`', r'<font face="Courier" size="8">\1</font>', line)
-            
-            # Remove emojis
-            line = re.sub(r'[🔴🟠🟡🟢🔵⚪🎯⚠️✅❌📊🔍🛡️📝🔐💡]', '', line)
+            # Format inline markdown and risk level colors
+            line = _INLINE_RE.sub(_format_inline, line)
             
-            # Apply color formatting for risk levels
-            line = re.sub(r'\b(CRITICAL)\b', r'<font color="#dc2626"><b>\1</b></font>', line)
-            line = re.sub(r'\b(HIGH)\b', r'<font color="#ea580c"><b>\1</b></font>', line)
-            line = re.sub(r'\b(MEDIUM)\b', r'<font color="#ca8a04"><b>\1</b></font>', line)
-            line = re.sub(r'\b(LOW)\b', r'<font color="#16a34a"><b>\1</b></font>', line)
-            line = re.sub(r'\b(P0)\b', r'<font color="#dc2626"><b>\1</b></font>', line)
-            line = re.sub(r'\b(P1)\b', r'<font color="#ea580c"><b>\1</b></font>', line)
-            line = re.sub(r'\b(P2)\b', r'<font color="#ca8a04"><b>\1</b></font>', line)
+            # Remove emojis (pure-ASCII lines, the common case, can't contain any)
+            if not line.isascii():
+                line = line.translate(_EMOJI_TABLE)
             
             if line:
                 story.append(Paragraph(line, body_style))
-        
-        i += 1
     
     # Add any remaining table
     if current_table:
-        table_element = create_reportlab_table(current_table)
+        table_element = _build_table(current_table)
         if table_element:
             story.append(table_element)
     
     # Build PDF
     doc.build(story)
-    
-    # Get PDF bytes
-    pdf_bytes = buffer.getvalue()
-    buffer.close()
-    
-    return pdf_bytes
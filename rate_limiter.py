@@ -0,0 +1,80 @@
+"""
+Per-API-key sliding-window rate limiting
+
+Enforces APIKey.rate_limit (requests per minute). Uses a Redis sorted set
+per key when REDIS_URL is set and redis is installed, so the limit holds
+across worker processes; otherwise falls back to an in-process window.
+"""
+
+import logging
+import os
+import secrets
+import threading
+import time
+from collections import defaultdict, deque
+from typing import Optional
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+RATE_LIMIT_WINDOW_MS = 60_000
+
+# Trim the window, count, and admit atomically: KEYS[1]=key, ARGV=now_ms, window_ms, limit, member
+_SLIDING_WINDOW_LUA = """
+redis.call('ZREMRANGEBYSCORE', KEYS[1], 0, tonumber(ARGV[1]) - tonumber(ARGV[2]))
+if redis.call('ZCARD', KEYS[1]) < tonumber(ARGV[3]) then
+    redis.call('ZADD', KEYS[1], ARGV[1], ARGV[4])
+    redis.call('PEXPIRE', KEYS[1], ARGV[2])
+    return 1
+end
+return 0
+"""
+
+
+class SlidingWindowRateLimiter:
+    """Admit at most `limit` requests per key in any rolling window"""
+
+    def __init__(self, redis_url: Optional[str] = None, window_ms: int = RATE_LIMIT_WINDOW_MS):
+        self.window_ms = window_ms
+        self._script = None
+        if redis_url and redis is not None:
+            try:
+                client = redis.Redis.from_url(redis_url)
+                self._script = client.register_script(_SLIDING_WINDOW_LUA)
+                logger.info("✅ API key rate limiting backed by Redis")
+            except Exception as e:
+                logger.warning(f"⚠️ Redis unavailable for rate limiting, using in-process window: {e}")
+        # In-process fallback: key -> timestamps (ms) of admitted requests
+        self._local = defaultdict(deque)
+        self._lock = threading.Lock()
+
+    def allow(self, key_id: int, limit: Optional[int]) -> bool:
+        """Record a request for `key_id`; False if it would exceed `limit` (None/0 = unlimited)"""
+        if not limit:
+            return True
+        now_ms = int(time.time() * 1000)
+        if self._script is not None:
+            try:
+                member = f"{now_ms}-{secrets.token_hex(4)}"
+                return bool(self._script(keys=[f"rl:{key_id}"], args=[now_ms, self.window_ms, limit, member]))
+            except Exception as e:
+                logger.warning(f"⚠️ Redis rate limit check failed, using in-process window: {e}")
+        return self._allow_local(key_id, limit, now_ms)
+
+    def _allow_local(self, key_id: int, limit: int, now_ms: int) -> bool:
+        with self._lock:
+            window = self._local[key_id]
+            cutoff = now_ms - self.window_ms
+            while window and window[0] <= cutoff:
+                window.popleft()
+            if len(window) >= limit:
+                return False
+            window.append(now_ms)
+            return True
+
+
+api_key_rate_limiter = SlidingWindowRateLimiter(os.getenv("REDIS_URL"))
@@ -4,7 +4,9 @@ Quick script to display your Render environment variable configuration
 Copy and paste these into Render Dashboard → Environment tab
 """
 
-print("""
+import sys
+
+_BANNER = """
 ╔══════════════════════════════════════════════════════════════════╗
 ║       RENDER ENVIRONMENT VARIABLES CONFIGURATION                  ║
 ╚══════════════════════════════════════════════════════════════════╝
@@ -104,4 +106,9 @@ Dashboard → Your Web Service → Environment Tab → Add Environment Variable
 
 You're ready to deploy! 🚀
 
-""")
+
+""".encode('utf-8')
+
+
+if __name__ == "__main__":
+    sys.stdout.buffer.write(_BANNER)
@@ -1,189 +1,361 @@
 """
-Simple JSON-based storage for users and assessments
-No database required!
+Simple SQLite-based storage for users and assessments
+No database server required!
 """
 
 import json
-import os
+import sqlite3
+import threading
 from datetime import datetime
 from pathlib import Path
 import hashlib
+import hmac
+
+try:
+    import bcrypt
+except ImportError:
+    bcrypt = None
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
 
 STORAGE_DIR = Path("data")
+DB_FILE = STORAGE_DIR / "app.sqlite"
+
+# Pre-SQLite JSON stores, imported once into an empty database
 USERS_FILE = STORAGE_DIR / "users.json"
 ASSESSMENTS_FILE = STORAGE_DIR / "assessments.json"
 
 # Ensure storage directory exists
 STORAGE_DIR.mkdir(exist_ok=True)
 
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    username TEXT PRIMARY KEY,
+    password_hash TEXT NOT NULL,
+    email TEXT,
+    is_admin INTEGER NOT NULL DEFAULT 0,
+    created_at TEXT
+);
+CREATE TABLE IF NOT EXISTS assessments (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    username TEXT NOT NULL,
+    created_at TEXT,
+    framework TEXT,
+    risk_area TEXT,
+    payload TEXT NOT NULL
+);
+DROP INDEX IF EXISTS ix_assessments_username;
+CREATE INDEX IF NOT EXISTS ix_assessments_user_created ON assessments (username, created_at DESC);
+CREATE INDEX IF NOT EXISTS ix_assessments_created ON assessments (created_at DESC);
+CREATE INDEX IF NOT EXISTS ix_assessments_framework ON assessments (framework);
+CREATE INDEX IF NOT EXISTS ix_assessments_risk_area ON assessments (risk_area);
+
+-- Running counts per framework / risk area / user, kept current by triggers
+CREATE TABLE IF NOT EXISTS assessment_stats (
+    dimension TEXT NOT NULL,
+    value TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (dimension, value)
+);
+CREATE TRIGGER IF NOT EXISTS trg_assessments_stats_insert AFTER INSERT ON assessments
+BEGIN
+    INSERT INTO assessment_stats (dimension, value, count) VALUES
+        ('framework', COALESCE(NEW.framework, 'Unknown'), 1),
+        ('risk_area', COALESCE(NEW.risk_area, 'Unknown'), 1),
+        ('username', NEW.username, 1)
+    ON CONFLICT (dimension, value) DO UPDATE SET count = count + 1;
+END;
+CREATE TRIGGER IF NOT EXISTS trg_assessments_stats_delete AFTER DELETE ON assessments
+BEGIN
+    UPDATE assessment_stats SET count = count - 1
+    WHERE (dimension = 'framework' AND value = COALESCE(OLD.framework, 'Unknown'))
+       OR (dimension = 'risk_area' AND value = COALESCE(OLD.risk_area, 'Unknown'))
+       OR (dimension = 'username' AND value = OLD.username);
+    DELETE FROM assessment_stats WHERE count <= 0;
+END;
+"""
+
+# Rebuilds assessment_stats from scratch (databases created before it existed);
+# run statement by statement inside one transaction, not via executescript
+_REBUILD_STATS = (
+    "DELETE FROM assessment_stats",
+    """INSERT INTO assessment_stats (dimension, value, count)
+    SELECT 'framework', COALESCE(framework, 'Unknown'), COUNT(*) FROM assessments GROUP BY 2""",
+    """INSERT INTO assessment_stats (dimension, value, count)
+    SELECT 'risk_area', COALESCE(risk_area, 'Unknown'), COUNT(*) FROM assessments GROUP BY 2""",
+    """INSERT INTO assessment_stats (dimension, value, count)
+    SELECT 'username', username, COUNT(*) FROM assessments GROUP BY 2""",
+)
+
+# One connection per thread (sqlite3 connections aren't shareable across threads)
+_local = threading.local()
+
+# Schema/default-user setup runs once per process, on first connection rather than at import
+_initialized = False
+_init_lock = threading.Lock()
+
+
+def _connect():
+    """Get this thread's connection, opening it (WAL, relaxed fsync) on first use"""
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        conn = sqlite3.connect(DB_FILE)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        _local.conn = conn
+        if not _initialized:
+            _ensure_initialized(conn)
+    return conn
+
+
+def _row_to_assessment(row):
+    """Rebuild the stored assessment dict with its id/created_at/username metadata"""
+    assessment = json.loads(row["payload"])
+    assessment["id"] = row["id"]
+    assessment["created_at"] = row["created_at"]
+    assessment["username"] = row["username"]
+    return assessment
+
 
-def _load_json(filepath):
-    """Load JSON file or return empty dict"""
-    if filepath.exists():
+def _import_json_files(conn):
+    """Copy users.json / assessments.json into an empty database (one-time upgrade)"""
+    if conn.execute("SELECT 1 FROM users LIMIT 1").fetchone():
+        return
+
+    # Same race as _create_default_users: re-check under the write lock so
+    # only one of several first-time workers imports the JSON files
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        if conn.execute("SELECT 1 FROM users LIMIT 1").fetchone():
+            conn.rollback()
+            return
+        _copy_json_files(conn)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+
+def _copy_json_files(conn):
+    if USERS_FILE.exists():
+        with open(USERS_FILE, 'r', encoding='utf-8') as f:
+            users = json.load(f)
+        conn.executemany(
+            "INSERT OR IGNORE INTO users (username, password_hash, email, is_admin, created_at) VALUES (?, ?, ?, ?, ?)",
+            [
+                (username, data["password_hash"], data.get("email"), bool(data.get("is_admin")), data.get("created_at"))
+                for username, data in users.items()
+            ]
+        )
+
+    if ASSESSMENTS_FILE.exists():
+        for username, user_assessments in _iter_json_users(ASSESSMENTS_FILE):
+            for assessment in user_assessments:
+                _insert_assessment(conn, username, assessment, assessment.get("created_at"))
+
+
+def _iter_json_users(filepath):
+    """Yield (username, assessments) from a JSON store, one user at a time with ijson if available"""
+    if ijson is None:
         with open(filepath, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    return {}
+            yield from json.load(f).items()
+        return
+    with open(filepath, 'rb') as f:
+        yield from ijson.kvitems(f, '', use_float=True)
 
 
-def _save_json(filepath, data):
-    """Save data to JSON file"""
-    with open(filepath, 'w', encoding='utf-8') as f:
-        json.dump(data, f, indent=2, default=str)
+def _insert_assessment(conn, username, assessment_data, created_at):
+    payload = {k: v for k, v in assessment_data.items() if k not in ("id", "created_at", "username")}
+    cursor = conn.execute(
+        "INSERT INTO assessments (username, created_at, framework, risk_area, payload) VALUES (?, ?, ?, ?, ?)",
+        (
+            username,
+            created_at,
+            assessment_data.get("framework"),
+            assessment_data.get("risk_area"),
+            json.dumps(payload, default=str)
+        )
+    )
+    return cursor.lastrowid
 
 
-def hash_password(password):
-    """Simple password hashing"""
+def _legacy_hash(password):
+    """Unsalted SHA256, used before bcrypt (and when bcrypt isn't installed)"""
     return hashlib.sha256(password.encode()).hexdigest()
 
 
+def hash_password(password):
+    """Hash a password with bcrypt (falls back to SHA256 if bcrypt isn't installed)"""
+    if bcrypt is None:
+        return _legacy_hash(password)
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+
+
+def verify_password(password, password_hash):
+    """Check a password against a bcrypt or legacy SHA256 hash (constant-time)"""
+    if password_hash.startswith('$2'):
+        return bcrypt is not None and bcrypt.checkpw(password.encode('utf-8'), password_hash.encode('utf-8'))
+    return hmac.compare_digest(password_hash, _legacy_hash(password))
+
+
 # ============= USER MANAGEMENT =============
 
+# Seeded into an empty users table: (username, password, email, is_admin)
+_DEFAULT_USERS = (
+    ("admin", "admin123", "admin@example.com", True),
+    ("demo", "demo123", "demo@example.com", False),
+)
+
 def create_user(username, password, email, is_admin=False):
     """Create a new user"""
-    users = _load_json(USERS_FILE)
-    
-    if username in users:
+    conn = _connect()
+    try:
+        with conn:
+            conn.execute(
+                "INSERT INTO users (username, password_hash, email, is_admin, created_at) VALUES (?, ?, ?, ?, ?)",
+                (username, hash_password(password), email, is_admin, datetime.now().isoformat())
+            )
+    except sqlite3.IntegrityError:
         return False, "Username already exists"
-    
-    users[username] = {
-        "password_hash": hash_password(password),
-        "email": email,
-        "is_admin": is_admin,
-        "created_at": datetime.now().isoformat()
-    }
-    
-    _save_json(USERS_FILE, users)
     return True, "User created successfully"
 
 
 def authenticate_user(username, password):
     """Authenticate a user"""
-    users = _load_json(USERS_FILE)
-    
-    if username not in users:
+    user = _connect().execute(
+        "SELECT email, is_admin, password_hash FROM users WHERE username = ?", (username,)
+    ).fetchone()
+
+    if user is None:
         return None
-    
-    user = users[username]
-    if user["password_hash"] == hash_password(password):
+
+    if verify_password(password, user["password_hash"]):
+        # Re-hash legacy SHA256 passwords with bcrypt on successful login
+        if bcrypt is not None and not user["password_hash"].startswith('$2'):
+            conn = _connect()
+            with conn:
+                conn.execute(
+                    "UPDATE users SET password_hash = ? WHERE username = ?", (hash_password(password), username)
+                )
         return {
             "username": username,
             "email": user["email"],
-            "is_admin": user["is_admin"]
+            "is_admin": bool(user["is_admin"])
         }
     return None
 
 
 def get_all_users():
     """Get all users (admin only)"""
-    users = _load_json(USERS_FILE)
+    rows = _connect().execute("SELECT username, email, is_admin, created_at FROM users")
     return [
         {
-            "username": username,
-            "email": data["email"],
-            "is_admin": data["is_admin"],
-            "created_at": data["created_at"]
+            "username": row["username"],
+            "email": row["email"],
+            "is_admin": bool(row["is_admin"]),
+            "created_at": row["created_at"]
         }
-        for username, data in users.items()
+        for row in rows
     ]
 
 
 def initialize_default_users():
     """Create default admin and demo user if none exist"""
-    users = _load_json(USERS_FILE)
-    
-    if not users:
-        # Create admin
-        users["admin"] = {
-            "password_hash": hash_password("admin123"),
-            "email": "admin@example.com",
-            "is_admin": True,
-            "created_at": datetime.now().isoformat()
-        }
-        
-        # Create demo user
-        users["demo"] = {
-            "password_hash": hash_password("demo123"),
-            "email": "demo@example.com",
-            "is_admin": False,
-            "created_at": datetime.now().isoformat()
-        }
-        
-        _save_json(USERS_FILE, users)
-        return True
-    return False
+    return _create_default_users(_connect())
+
+
+def _create_default_users(conn):
+    if conn.execute("SELECT 1 FROM users LIMIT 1").fetchone():
+        return False
+
+    # Workers starting together race here: BEGIN IMMEDIATE takes the write lock
+    # before the re-check, so exactly one of them hashes and inserts
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        if conn.execute("SELECT 1 FROM users LIMIT 1").fetchone():
+            conn.rollback()
+            return False
+        now = datetime.now().isoformat()
+        conn.executemany(
+            "INSERT INTO users (username, password_hash, email, is_admin, created_at) VALUES (?, ?, ?, ?, ?)",
+            [
+                (username, hash_password(password), email, is_admin, now)
+                for username, password, email, is_admin in _DEFAULT_USERS
+            ]
+        )
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return True
 
 
 # ============= ASSESSMENT MANAGEMENT =============
 
 def save_assessment(username, assessment_data):
     """Save an assessment for a user"""
-    assessments = _load_json(ASSESSMENTS_FILE)
-    
-    if username not in assessments:
-        assessments[username] = []
-    
-    # Add metadata
-    assessment_data["id"] = len(assessments[username]) + 1
+    conn = _connect()
+
+    # Add metadata (id is assigned by SQLite, so it stays unique after deletes)
     assessment_data["created_at"] = datetime.now().isoformat()
     assessment_data["username"] = username
-    
-    assessments[username].append(assessment_data)
-    _save_json(ASSESSMENTS_FILE, assessments)
-    
+
+    with conn:
+        assessment_data["id"] = _insert_assessment(conn, username, assessment_data, assessment_data["created_at"])
+
     return assessment_data["id"]
 
 
 def get_user_assessments(username):
     """Get all assessments for a user"""
-    assessments = _load_json(ASSESSMENTS_FILE)
-    return assessments.get(username, [])
-
-
-def get_all_assessments():
-    """Get all assessments from all users (admin only)"""
-    assessments = _load_json(ASSESSMENTS_FILE)
-    all_assessments = []
-    
-    for username, user_assessments in assessments.items():
-        all_assessments.extend(user_assessments)
-    
+    rows = _connect().execute(
+        "SELECT * FROM assessments WHERE username = ? ORDER BY created_at", (username,)
+    )
+    return [_row_to_assessment(row) for row in rows]
+
+
+def get_all_assessments(limit=None, offset=0):
+    """Get all assessments from all users (admin only), optionally one page at a time"""
     # Sort by created_at descending
-    all_assessments.sort(key=lambda x: x.get("created_at", ""), reverse=True)
-    return all_assessments
+    rows = _connect().execute(
+        "SELECT * FROM assessments ORDER BY created_at DESC LIMIT ? OFFSET ?",
+        (-1 if limit is None else limit, offset)
+    )
+    return [_row_to_assessment(row) for row in rows]
 
 
 def delete_assessment(username, assessment_id):
     """Delete an assessment"""
-    assessments = _load_json(ASSESSMENTS_FILE)
-    
-    if username in assessments:
-        assessments[username] = [
-            a for a in assessments[username] 
-            if a["id"] != assessment_id
-        ]
-        _save_json(ASSESSMENTS_FILE, assessments)
-        return True
-    return False
+    conn = _connect()
+    with conn:
+        cursor = conn.execute(
+            "DELETE FROM assessments WHERE id = ? AND username = ?", (assessment_id, username)
+        )
+    return cursor.rowcount > 0
 
 
 def get_assessment_stats():
     """Get assessment statistics"""
-    assessments = _load_json(ASSESSMENTS_FILE)
-    
-    total_assessments = sum(len(user_assessments) for user_assessments in assessments.values())
-    total_users = len(assessments)
-    
     frameworks = {}
     risk_areas = {}
-    
-    for user_assessments in assessments.values():
-        for assessment in user_assessments:
-            framework = assessment.get("framework", "Unknown")
-            frameworks[framework] = frameworks.get(framework, 0) + 1
-            
-            risk_area = assessment.get("risk_area", "Unknown")
-            risk_areas[risk_area] = risk_areas.get(risk_area, 0) + 1
-    
+    total_users = 0
+
+    # Served from the trigger-maintained counts, not a scan of assessments
+    for dimension, value, count in _connect().execute("SELECT dimension, value, count FROM assessment_stats"):
+        if dimension == 'framework':
+            frameworks[value] = count
+        elif dimension == 'risk_area':
+            risk_areas[value] = count
+        else:
+            total_users += 1
+
+    total_assessments = sum(frameworks.values())
+
     return {
         "total_assessments": total_assessments,
         "total_users": total_users,
@@ -192,5 +364,40 @@ def get_assessment_stats():
     }
 
 
-# Initialize default users on import
-initialize_default_users()
+def _initialize_database(conn):
+    conn.executescript(_SCHEMA)
+    _import_json_files(conn)
+    _rebuild_stats_if_needed(conn)
+
+
+def _stats_missing(conn):
+    has_stats = conn.execute("SELECT 1 FROM assessment_stats LIMIT 1").fetchone()
+    return not has_stats and conn.execute("SELECT 1 FROM assessments LIMIT 1").fetchone()
+
+
+def _rebuild_stats_if_needed(conn):
+    if not _stats_missing(conn):
+        return
+
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        if not _stats_missing(conn):
+            conn.rollback()
+            return
+        for statement in _REBUILD_STATS:
+            conn.execute(statement)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+
+def _ensure_initialized(conn):
+    """Create the schema (importing any JSON data) and default users, once per process"""
+    global _initialized
+    with _init_lock:
+        if _initialized:
+            return
+        _initialize_database(conn)
+        _create_default_users(conn)
+        _initialized = True
@@ -11,19 +11,36 @@ Exit code 0 = success, non-zero = failure.
 import types
 import sys
 
-# Provide a minimal fake `streamlit` module so we can import `app` during tests
-fake_st = types.SimpleNamespace()
-fake_st.set_page_config = lambda *a, **k: None
-fake_st.markdown = lambda *a, **k: None
-fake_st.file_uploader = lambda *a, **k: None
-fake_st.text_input = lambda *a, **k: None
-fake_st.success = lambda *a, **k: None
-fake_st.warning = lambda *a, **k: None
-fake_st.info = lambda *a, **k: None
-fake_st.error = lambda *a, **k: None
-fake_st.empty = lambda *a, **k: types.SimpleNamespace(text=lambda *a, **k: None)
-fake_st.progress = lambda *a, **k: types.SimpleNamespace(progress=lambda *a, **k: None)
-fake_st.columns = lambda n: [types.SimpleNamespace(__enter__=lambda *a, **k: None, __exit__=lambda *a, **k: None) for _ in range(n)]
+class _Noop:
+    """Universal no-op: any call, attribute, or `with` block returns itself; falsy and empty"""
+    def __call__(self, *a, **k):
+        return self
+    def __getattr__(self, name):
+        return self
+    def __enter__(self):
+        return self
+    def __exit__(self, *a):
+        return False
+    def __iter__(self):
+        return iter(())
+    def __bool__(self):
+        return False
+
+_NOOP = _Noop()
+
+
+class _StubModule(types.ModuleType):
+    """Module whose explicit attributes are given; every other public name resolves to `default`"""
+    def __init__(self, name, default=_NOOP, **attrs):
+        super().__init__(name)
+        self.__dict__.update(attrs)
+        self._default = default
+    def __getattr__(self, name):
+        if name.startswith('__'):
+            raise AttributeError(name)
+        return self._default
+
+
 class _DummySessionState:
     def __init__(self):
         self._d = {}
@@ -39,18 +56,19 @@ class _DummySessionState:
     def get(self, key, default=None):
         return self._d.get(key, default)
 
-fake_st.session_state = _DummySessionState()
-
-sys.modules['streamlit'] = fake_st
+# Provide a minimal fake `streamlit` module so we can import `app` during tests
+sys.modules['streamlit'] = _StubModule(
+    'streamlit',
+    session_state=_DummySessionState(),
+    columns=lambda spec, *a, **k: [_NOOP] * (spec if isinstance(spec, int) else len(spec)),
+)
 
 # Provide a minimal fake `anthropic` module so we can import `app` during tests
-fake_anthropic = types.SimpleNamespace()
 class _AnthropicStub:
     def __init__(self, *a, **k):
         pass
 
-fake_anthropic.Anthropic = _AnthropicStub
-sys.modules['anthropic'] = fake_anthropic
+sys.modules['anthropic'] = _StubModule('anthropic', Anthropic=_AnthropicStub)
 
 # Mock database modules
 class _FakeDBSession:
@@ -70,36 +88,20 @@ class _FakeDBSession:
             def order_by(self, *args, **kwargs): return self
         return FakeQuery()
 
-fake_db = types.SimpleNamespace()
-fake_db.SessionLocal = lambda: _FakeDBSession()
-fake_db.init_db = lambda: None
-fake_db.engine = types.SimpleNamespace()
-sys.modules['database'] = fake_db
+sys.modules['database'] = _StubModule('database', SessionLocal=_FakeDBSession)
 
-fake_models = types.SimpleNamespace()
+# Every model class is the same kwargs-bag stand-in
 class _FakeModel:
     def __init__(self, **kwargs):
         for k, v in kwargs.items():
             setattr(self, k, v)
         self.id = 1
-fake_models.User = _FakeModel
-fake_models.Organization = _FakeModel
-fake_models.APIKey = _FakeModel
-fake_models.AuditLog = _FakeModel
-fake_models.ThreatAssessment = _FakeModel
-fake_models.UsageStats = _FakeModel
-fake_models.APIUsageLog = _FakeModel
-sys.modules['models'] = fake_models
-
-# Mock auth module
-fake_auth = types.SimpleNamespace()
-fake_auth.PasswordAuth = type('PasswordAuth', (), {})
-sys.modules['auth'] = fake_auth
-
-# Mock admin dashboard
-fake_admin = types.SimpleNamespace()
-fake_admin.render_admin_dashboard = lambda: None
-sys.modules['admin_dashboard'] = fake_admin
+
+sys.modules['models'] = _StubModule('models', default=_FakeModel)
+
+# Mock auth module and admin dashboard
+sys.modules['auth'] = _StubModule('auth')
+sys.modules['admin_dashboard'] = _StubModule('admin_dashboard')
 
 from app import generate_threat_assessment
 import anthropic
@@ -2,17 +2,16 @@
 Quick test to verify image processing fix for Claude Vision API
 """
 import base64
-import io
-from PIL import Image
+
+# 10x10 solid red PNG, pre-encoded so the test doesn't run PIL/zlib each time
+TEST_PNG_BYTES = base64.standard_b64decode(
+    'iVBORw0KGgoAAAANSUhEUgAAAAoAAAAKCAIAAAACUFjqAAAAEklEQVR4nGP8z4APMOGVHbHSAEEsAROxCnMTAAAAAElFTkSuQmCC'
+)
 
 def test_data_uri_stripping():
     """Test that data URI prefix is properly stripped"""
     
-    # Create a small test image
-    img = Image.new('RGB', (10, 10), color='red')
-    img_buffer = io.BytesIO()
-    img.save(img_buffer, format='PNG')
-    img_bytes = img_buffer.getvalue()
+    img_bytes = TEST_PNG_BYTES
     
     # Encode to base64
     base64_image = base64.standard_b64encode(img_bytes).decode('utf-8')
@@ -3,6 +3,12 @@ Threat Modeling Frameworks and Risk Assessment Definitions
 Complete framework definitions from the original application
 """
 
+import sys
+from functools import lru_cache
+from string import Template
+from types import MappingProxyType
+from typing import Tuple
+
 FRAMEWORKS = {
     "MITRE ATT&CK": {
         "description": "Comprehensive framework for understanding cyber adversary behavior",
@@ -149,76 +155,67 @@ RISK_AREAS = {
 }
 
 
-def build_comprehensive_prompt(project_info: dict, documents_content: str, frameworks: list, risk_areas: list, assessment_date: str) -> str:
-    """
-    Build the comprehensive threat assessment prompt using the original logic
-    This is the EXACT prompt that produced perfect results
-    """
-    
-    # Join multiple frameworks
-    frameworks_str = " + ".join(frameworks) if len(frameworks) > 1 else frameworks[0]
-    framework_descriptions = "\n".join([
-        f"**{fw}** - {FRAMEWORKS[fw]['description']}\n  Focus: {FRAMEWORKS[fw]['focus']}\n  Coverage: {', '.join(FRAMEWORKS[fw]['coverage'][:3])}..."
-        for fw in frameworks
-    ])
-    
-    # Risk areas descriptions
-    risk_areas_details = "\n".join([
-        f"- {area}: {RISK_AREAS[area]['description']}"
-        for area in risk_areas
-    ])
-    
-    # Risk areas specialized sections
-    risk_areas_sections = "\n".join([
-        f'''## {area}
+def _freeze(value):
+    """Read-only deep copy: dicts -> MappingProxyType, lists -> tuples, strings interned"""
+    if isinstance(value, dict):
+        return MappingProxyType({sys.intern(k): _freeze(v) for k, v in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(v) for v in value)
+    if isinstance(value, str):
+        return sys.intern(value)
+    return value
+
 
-**Summary:** [1-2 sentences describing the risk landscape for {area} based on the documentation review]
+# Static definitions: frozen so no caller can mutate them (the cached prompt parts depend on that)
+FRAMEWORKS = _freeze(FRAMEWORKS)
+RISK_AREAS = _freeze(RISK_AREAS)
+
+
+# Per-framework prompt snippets (FRAMEWORKS is static), built once
+_FRAMEWORK_DESCRIPTIONS = {
+    fw: f"**{fw}** - {info['description']}\n  Focus: {info['focus']}\n  Coverage: {', '.join(info['coverage'][:3])}..."
+    for fw, info in FRAMEWORKS.items()
+}
+_FRAMEWORK_REFS = {
+    fw: f"- **{fw}** - {info['description']}\n  - Focus: {info['focus']}\n  - Coverage: {', '.join(info['coverage'][:3])}..."
+    for fw, info in FRAMEWORKS.items()
+}
+
+# Per-risk-area report section (RISK_AREAS is static), built once
+_RISK_AREA_SECTION_TEMPLATE = Template("""## $area
+
+**Summary:** [1-2 sentences describing the risk landscape for $area based on the documentation review]
 
 | Threat ID | Evidence Source (Doc) | Example from Docs | Threat | Likelihood | Impact | Risk Priority | Mitigation Strategy |
 |-----------|-----------------------|-------------------|--------|-----------|--------|---------------|---------------------|
-| T-{area[:3].upper()}-001 | [Doc: Section] | [Specific example] | [specific threat] | [1-5] | [1-5] | P0/P1/P2 | [specific action] |
-'''
-        for area in risk_areas
-    ])
-    
-    # Compliance sections
-    compliance_rows = "\n".join([
-        f"| [F-ID] | [finding] | {req} | [gap description] | [evidence needed] | [timeline] |"
-        for req in project_info.get('compliance', [])
-    ])
-    
-    # Framework references
-    framework_refs = "\n".join([
-        f"- **{fw}** - {FRAMEWORKS[fw]['description']}\n  - Focus: {FRAMEWORKS[fw]['focus']}\n  - Coverage: {', '.join(FRAMEWORKS[fw]['coverage'][:3])}..."
-        for fw in frameworks
-    ])
-    
-    # Compliance framework references
-    compliance_refs = "\n".join([
-        f"- **{req}** - Regulatory compliance framework"
-        for req in project_info.get('compliance', [])
-    ])
-    
-    prompt = f"""You are an expert cybersecurity consultant specializing in threat modeling and risk assessment. 
-Perform a comprehensive threat assessment for the following project using the {frameworks_str} framework(s).
+| T-$threat_prefix-001 | [Doc: Section] | [Specific example] | [specific threat] | [1-5] | [1-5] | P0/P1/P2 | [specific action] |
+""")
+_RISK_AREA_SECTIONS = {
+    area: _RISK_AREA_SECTION_TEMPLATE.substitute(area=area, threat_prefix=area[:3].upper())
+    for area in RISK_AREAS
+}
+
+# Static skeleton of the assessment prompt, parsed once; build_comprehensive_prompt fills the $fields
+_PROMPT_TEMPLATE = Template("""You are an expert cybersecurity consultant specializing in threat modeling and risk assessment. 
+Perform a comprehensive threat assessment for the following project using the ${frameworks_str} framework(s).
 
 **PROJECT INFORMATION:**
-- Project Name: {project_info['name']}
-- Application Type: {project_info['app_type']}
-- Deployment Model: {project_info['deployment']}
-- Business Criticality: {project_info['criticality']}
-- Compliance Requirements: {', '.join(project_info.get('compliance', []))}
-- Environment: {project_info['environment']}
-- Assessment Date: {assessment_date}
+- Project Name: ${project_name}
+- Application Type: ${app_type}
+- Deployment Model: ${deployment}
+- Business Criticality: ${criticality}
+- Compliance Requirements: ${compliance_list}
+- Environment: ${environment}
+- Assessment Date: ${assessment_date}
 
 **UPLOADED DOCUMENTATION:**
-{documents_content}
+${documents_content}
 
-**THREAT MODELING FRAMEWORK(S):** {frameworks_str}
-{framework_descriptions}
+**THREAT MODELING FRAMEWORK(S):** ${frameworks_str}
+${framework_descriptions}
 
 **SPECIFIC RISK FOCUS AREAS TO ASSESS:**
-{risk_areas_details}
+${risk_areas_details}
 
 **ASSESSMENT REQUIREMENTS - EVIDENCE-BASED ANALYSIS:**
 
@@ -254,13 +251,13 @@ Generate a professional threat assessment report with complete structure, extens
 
 ---
 
-# THREAT MODELING ANALYSIS - {frameworks_str}
+# THREAT MODELING ANALYSIS - ${frameworks_str}
 
 **Summary:** [2-3 sentence overview of the threat modeling analysis, the framework's approach, and key findings discovered during the analysis]
 
-Comprehensive threat analysis organized by {frameworks_str} categories with risk scoring and mitigation paths, **with evidence citations and concrete examples from uploaded documentation**.
+Comprehensive threat analysis organized by ${frameworks_str} categories with risk scoring and mitigation paths, **with evidence citations and concrete examples from uploaded documentation**.
 
-For each relevant category in {frameworks_str}, provide detailed analysis:
+For each relevant category in ${frameworks_str}, provide detailed analysis:
 
 ## [Category Name]
 
@@ -276,7 +273,7 @@ For each relevant category in {frameworks_str}, provide detailed analysis:
 
 **Summary:** [2-3 sentences describing the selected risk focus areas, why they're important for this project, and the overall risk landscape across these areas]
 
-{risk_areas_sections}
+${risk_areas_sections}
 
 ---
 
@@ -369,14 +366,14 @@ For each relevant category in {frameworks_str}, provide detailed analysis:
 
 | Finding ID | Finding | Compliance Requirement | Compliance Gap | Required Evidence | Remediation Timeline |
 |----------|---------|----------------------|----------------|------------------|---------------------|
-{compliance_rows}
+${compliance_rows}
 
 ---
 
 # REFERENCES
 
 **Threat Modeling Frameworks:**
-{framework_refs}
+${framework_refs}
 
 **Security Standards & Guidelines:**
 - [NIST SP 800-53 Rev 5](https://csrc.nist.gov/publications/detail/sp/800-53/rev-5/final) - Security and Privacy Controls for Information Systems and Organizations
@@ -386,7 +383,7 @@ For each relevant category in {frameworks_str}, provide detailed analysis:
 - [ISO/IEC 27001:2013](https://www.iso.org/standard/54534.html) - Information Security Management Systems Requirements
 
 **Compliance Frameworks:**
-{compliance_refs}
+${compliance_refs}
 
 **Risk Assessment Methodologies:**
 - [CVSS v3.1](https://www.first.org/cvss/v3.1/specification-document) - Common Vulnerability Scoring System
@@ -431,6 +428,91 @@ By using this AI-generated report, you acknowledge that it serves as a starting
 4. **Professional Tone:** Executive summary suitable for C-level review
 5. **Document References:** Every finding must reference the source document
 
-Generate the complete, detailed, professionally formatted threat assessment report now."""
+Generate the complete, detailed, professionally formatted threat assessment report now.""")
+
+
+# Documentation beyond this is cut before it reaches the prompt: ~150k tokens at
+# ~4 chars/token, leaving room in a 200k context for the prompt itself and the report
+MAX_DOCUMENT_CHARS = 600_000
+_TRUNCATION_NOTE = "\n\n[Documentation truncated to fit the model's context window]"
+
+# The prompt split around the uploaded documentation: everything else is cacheable
+_PROMPT_HEAD_TEMPLATE, _PROMPT_TAIL_TEMPLATE = (
+    Template(part) for part in _PROMPT_TEMPLATE.template.split("${documents_content}")
+)
+
+
+def build_comprehensive_prompt(project_info: dict, documents_content: str, frameworks: list, risk_areas: list, assessment_date: str) -> str:
+    """
+    Build the comprehensive threat assessment prompt using the original logic
+    This is the EXACT prompt that produced perfect results
+    """
+    head, tail = _prompt_parts(
+        project_info['name'],
+        project_info['app_type'],
+        project_info['deployment'],
+        project_info['criticality'],
+        tuple(project_info.get('compliance') or ()),
+        project_info['environment'],
+        tuple(frameworks),
+        tuple(risk_areas),
+        assessment_date,
+    )
+    if len(documents_content) > MAX_DOCUMENT_CHARS:
+        documents_content = documents_content[:MAX_DOCUMENT_CHARS] + _TRUNCATION_NOTE
+    return head + documents_content + tail
+
+
+@lru_cache(maxsize=256)
+def _prompt_parts(project_name: str, app_type: str, deployment: str, criticality: str, compliance: tuple,
+                  environment: str, frameworks: tuple, risk_areas: tuple, assessment_date: str) -> Tuple[str, str]:
+    """
+    The prompt before and after the documentation, cached per input combination.
+    Documents are left out of the key so large uploads are never held by the cache.
+    """
+    
+    # Join multiple frameworks
+    frameworks_str = " + ".join(frameworks) if len(frameworks) > 1 else frameworks[0]
+    framework_descriptions = "\n".join(_FRAMEWORK_DESCRIPTIONS[fw] for fw in frameworks)
+    
+    # Risk areas descriptions
+    risk_areas_details = "\n".join(
+        f"- {area}: {RISK_AREAS[area]['description']}"
+        for area in risk_areas
+    )
+    
+    # Risk areas specialized sections
+    risk_areas_sections = "\n".join(_RISK_AREA_SECTIONS[area] for area in risk_areas)
+    
+    # Compliance sections
+    compliance_rows = "\n".join(
+        f"| [F-ID] | [finding] | {req} | [gap description] | [evidence needed] | [timeline] |"
+        for req in compliance
+    )
+    
+    # Framework references
+    framework_refs = "\n".join(_FRAMEWORK_REFS[fw] for fw in frameworks)
+    
+    # Compliance framework references
+    compliance_refs = "\n".join(
+        f"- **{req}** - Regulatory compliance framework"
+        for req in compliance
+    )
     
-    return prompt
+    fields = dict(
+        frameworks_str=frameworks_str,
+        project_name=project_name,
+        app_type=app_type,
+        deployment=deployment,
+        criticality=criticality,
+        compliance_list=', '.join(compliance),
+        environment=environment,
+        assessment_date=assessment_date,
+        framework_descriptions=framework_descriptions,
+        risk_areas_details=risk_areas_details,
+        risk_areas_sections=risk_areas_sections,
+        compliance_rows=compliance_rows,
+        framework_refs=framework_refs,
+        compliance_refs=compliance_refs,
+    )
+    return _PROMPT_HEAD_TEMPLATE.substitute(fields), _PROMPT_TAIL_TEMPLATE.substitute(fields)
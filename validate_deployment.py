@@ -1,10 +1,17 @@
 """
 Pre-deployment validation script
 Checks configuration and dependencies before deploying
+
+Each check returns (ok, message); the report is written in one go at the
+end. Pass --json for a machine-readable summary (e.g. for CI).
 """
 
+import importlib.util
+import json
 import os
+import re
 import sys
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 
@@ -12,11 +19,9 @@ def check_environment_file():
     """Check if .env file exists (for local dev)"""
     env_file = Path(".env")
     if env_file.exists():
-        print("✅ .env file found (for local development)")
-        return True
+        return True, "✅ .env file found (for local development)"
     else:
-        print("ℹ️  No .env file (OK for production - using environment variables)")
-        return True
+        return True, "ℹ️  No .env file (OK for production - using environment variables)"
 
 
 def check_required_files():
@@ -32,54 +37,71 @@ def check_required_files():
         "render.yaml",
     ]
     
+    # One directory listing instead of a stat() per file
+    with os.scandir(".") as entries:
+        present = {entry.name for entry in entries}
+    
     all_exist = True
+    lines = []
     for file in required_files:
-        if Path(file).exists():
-            print(f"✅ {file}")
+        if file in present:
+            lines.append(f"✅ {file}")
         else:
-            print(f"❌ {file} - MISSING!")
+            lines.append(f"❌ {file} - MISSING!")
             all_exist = False
     
-    return all_exist
+    return all_exist, "\n".join(lines)
+
 
+# Everything check_database_url looks for, in one pass over the URL: the
+# mutually exclusive prefixes, then sslmode anywhere and a trailing quote
+_DATABASE_URL_RE = re.compile(r"""
+    ^(?: (?P<quote>')
+       | (?P<psql>psql\ )
+       | (?P<scheme>postgresql://|postgres://|sqlite) )?
+    (?: (?=.*?(?P<ssl>sslmode=require)) )?
+    (?: .*(?P<trailing_quote>')\Z )?
+""", re.VERBOSE | re.DOTALL)
 
-def check_database_url():
+
+def check_database_url(database_url):
     """Check DATABASE_URL format"""
-    from database import DATABASE_URL
-    
-    print(f"\n📊 Database Configuration:")
-    print(f"Database URL: {DATABASE_URL[:30]}..." if len(DATABASE_URL) > 30 else f"Database URL: {DATABASE_URL}")
+    lines = [
+        "\n📊 Database Configuration:",
+        f"Database URL: {database_url[:30]}{'...' if len(database_url) > 30 else ''}",
+    ]
     
     # Check for common issues
     issues = []
+    match = _DATABASE_URL_RE.match(database_url)
+    scheme = match.group("scheme")
     
-    if DATABASE_URL.startswith("psql "):
+    if match.group("psql"):
         issues.append("❌ DATABASE_URL starts with 'psql ' - This will be auto-cleaned but should be fixed in env")
     
-    if DATABASE_URL.startswith("'") or DATABASE_URL.endswith("'"):
+    if match.group("quote") or match.group("trailing_quote"):
         issues.append("⚠️  DATABASE_URL has quotes - Will be auto-cleaned")
     
-    if DATABASE_URL.startswith("postgres://") and not DATABASE_URL.startswith("postgresql://"):
+    if scheme == "postgres://":
         issues.append("ℹ️  Using postgres:// - Will be auto-converted to postgresql://")
     
-    if DATABASE_URL.startswith("sqlite"):
-        print("⚠️  Using SQLite (OK for development, use PostgreSQL for production)")
-    elif DATABASE_URL.startswith("postgresql://"):
-        print("✅ Using PostgreSQL")
-        if "sslmode=require" in DATABASE_URL:
-            print("✅ SSL mode enabled")
+    if scheme == "sqlite":
+        lines.append("⚠️  Using SQLite (OK for development, use PostgreSQL for production)")
+    elif scheme == "postgresql://":
+        lines.append("✅ Using PostgreSQL")
+        if match.group("ssl"):
+            lines.append("✅ SSL mode enabled")
         else:
             issues.append("⚠️  SSL mode not explicitly set - Consider adding ?sslmode=require")
     
     if issues:
-        print("\n⚠️  DATABASE_URL Issues detected:")
-        for issue in issues:
-            print(f"  {issue}")
-        print("\n✅ Auto-cleanup is enabled in database.py - These will be handled automatically")
+        lines.append("\n⚠️  DATABASE_URL Issues detected:")
+        lines.extend(f"  {issue}" for issue in issues)
+        lines.append("\n✅ Auto-cleanup is enabled in database.py - These will be handled automatically")
     else:
-        print("✅ DATABASE_URL format looks good")
+        lines.append("✅ DATABASE_URL format looks good")
     
-    return True
+    return True, "\n".join(lines)
 
 
 def check_anthropic_key():
@@ -87,14 +109,11 @@ def check_anthropic_key():
     api_key = os.getenv("ANTHROPIC_API_KEY", "")
     
     if not api_key:
-        print("❌ ANTHROPIC_API_KEY not set!")
-        return False
+        return False, "❌ ANTHROPIC_API_KEY not set!"
     elif api_key.startswith("sk-ant-"):
-        print("✅ ANTHROPIC_API_KEY is set")
-        return True
+        return True, "✅ ANTHROPIC_API_KEY is set"
     else:
-        print("⚠️  ANTHROPIC_API_KEY is set but doesn't look valid (should start with sk-ant-)")
-        return False
+        return False, "⚠️  ANTHROPIC_API_KEY is set but doesn't look valid (should start with sk-ant-)"
 
 
 def check_secret_key():
@@ -102,18 +121,15 @@ def check_secret_key():
     secret_key = os.getenv("SECRET_KEY", "")
     
     if not secret_key:
-        print("⚠️  SECRET_KEY not set - Will use default (OK for dev, set for production)")
-        return True
+        return True, "⚠️  SECRET_KEY not set - Will use default (OK for dev, set for production)"
     elif len(secret_key) < 32:
-        print("⚠️  SECRET_KEY is too short (should be at least 32 characters)")
-        return False
+        return False, "⚠️  SECRET_KEY is too short (should be at least 32 characters)"
     else:
-        print("✅ SECRET_KEY is set")
-        return True
+        return True, "✅ SECRET_KEY is set"
 
 
 def check_dependencies():
-    """Check if key dependencies can be imported"""
+    """Check if key dependencies are installed"""
     dependencies = [
         ("fastapi", "FastAPI"),
         ("sqlalchemy", "SQLAlchemy"),
@@ -123,91 +139,104 @@ def check_dependencies():
     ]
     
     all_installed = True
-    print("\n📦 Checking Dependencies:")
+    lines = ["\n📦 Checking Dependencies:"]
     
+    # find_spec locates the package without running its (heavy) import
     for module, name in dependencies:
-        try:
-            __import__(module)
-            print(f"✅ {name}")
-        except ImportError:
-            print(f"❌ {name} - NOT INSTALLED")
+        if importlib.util.find_spec(module) is not None:
+            lines.append(f"✅ {name}")
+        else:
+            lines.append(f"❌ {name} - NOT INSTALLED")
             all_installed = False
     
-    return all_installed
+    return all_installed, "\n".join(lines)
 
 
-def test_database_connection():
+def test_database_connection(engine):
     """Test database connection"""
-    print("\n🔌 Testing Database Connection:")
+    heading = "\n🔌 Testing Database Connection:"
     try:
-        from database import engine
         from sqlalchemy import text
         
         with engine.connect() as conn:
             result = conn.execute(text("SELECT 1"))
             result.fetchone()
-            print("✅ Database connection successful")
-            return True
+            return True, f"{heading}\n✅ Database connection successful"
+    except Exception as e:
+        return False, f"{heading}\n❌ Database connection failed: {str(e)}"
+
+
+def _database_check(database, heading, check):
+    """Run check(database module), failing it cleanly if database.py can't be imported"""
+    try:
+        module = database.result()
     except Exception as e:
-        print(f"❌ Database connection failed: {str(e)}")
-        return False
+        return False, f"{heading}\n❌ Could not import database.py: {str(e)}"
+    return check(module)
 
 
-def main():
+def main(json_output=False):
     """Run all validation checks"""
-    print("=" * 60)
-    print("🚀 PRE-DEPLOYMENT VALIDATION")
-    print("=" * 60)
-    
-    print("\n📁 Checking Required Files:")
-    files_ok = check_required_files()
-    
-    print("\n🔧 Checking Environment:")
-    env_ok = check_environment_file()
-    
-    print("\n🔑 Checking API Keys:")
-    anthropic_ok = check_anthropic_key()
-    secret_ok = check_secret_key()
-    
-    print("\n🗄️  Checking Database:")
-    db_url_ok = check_database_url()
-    
-    deps_ok = check_dependencies()
-    
-    db_conn_ok = test_database_connection()
-    
-    print("\n" + "=" * 60)
-    print("📊 VALIDATION SUMMARY")
-    print("=" * 60)
-    
-    all_checks = [
-        ("Required Files", files_ok),
-        ("Environment Setup", env_ok),
-        ("Anthropic API Key", anthropic_ok),
-        ("Secret Key", secret_ok),
-        ("Database URL", db_url_ok),
-        ("Dependencies", deps_ok),
-        ("Database Connection", db_conn_ok),
+    # Checks are independent and mostly I/O (imports, DB handshake): run them
+    # concurrently; results are reported in this order once all are done
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        # database.py (SQLAlchemy, engine setup) is imported once, in a worker,
+        # and shared by both database checks
+        database = executor.submit(importlib.import_module, "database")
+        
+        # (section heading printed before it, summary name, check)
+        checks = [
+            ("\n📁 Checking Required Files:", "Required Files", check_required_files),
+            ("\n🔧 Checking Environment:", "Environment Setup", check_environment_file),
+            ("\n🔑 Checking API Keys:", "Anthropic API Key", check_anthropic_key),
+            (None, "Secret Key", check_secret_key),
+            ("\n🗄️  Checking Database:", "Database URL",
+             lambda: _database_check(database, "\n📊 Database Configuration:",
+                                     lambda db: check_database_url(db.DATABASE_URL))),
+            (None, "Dependencies", check_dependencies),
+            (None, "Database Connection",
+             lambda: _database_check(database, "\n🔌 Testing Database Connection:",
+                                     lambda db: test_database_connection(db.engine))),
+        ]
+        futures = [executor.submit(check) for _, _, check in checks]
+        results = [(heading, name) + future.result() for (heading, name, _), future in zip(checks, futures)]
+    
+    passed = sum(1 for _, _, ok, _ in results if ok)
+    total = len(results)
+    
+    if json_output:
+        sys.stdout.write(json.dumps({
+            "passed": passed == total,
+            "checks": [{"name": name, "ok": ok, "message": message.strip()} for _, name, ok, message in results],
+        }, indent=2) + "\n")
+        return 0 if passed == total else 1
+    
+    lines = [
+        "=" * 60,
+        "🚀 PRE-DEPLOYMENT VALIDATION",
+        "=" * 60,
     ]
+    for heading, _, _, message in results:
+        if heading:
+            lines.append(heading)
+        lines.append(message)
     
-    passed = sum(1 for _, status in all_checks if status)
-    total = len(all_checks)
+    lines += ["\n" + "=" * 60, "📊 VALIDATION SUMMARY", "=" * 60]
+    lines.extend(f"{'✅' if ok else '❌'} {name}" for _, name, ok, _ in results)
     
-    for check_name, status in all_checks:
-        icon = "✅" if status else "❌"
-        print(f"{icon} {check_name}")
-    
-    print("\n" + "=" * 60)
+    lines.append("\n" + "=" * 60)
     if passed == total:
-        print("🎉 ALL CHECKS PASSED! Ready for deployment.")
-        print("=" * 60)
-        return 0
+        lines += ["🎉 ALL CHECKS PASSED! Ready for deployment.", "=" * 60]
     else:
-        print(f"⚠️  {total - passed} CHECK(S) FAILED")
-        print("Please fix the issues above before deploying.")
-        print("=" * 60)
-        return 1
+        lines += [
+            f"⚠️  {total - passed} CHECK(S) FAILED",
+            "Please fix the issues above before deploying.",
+            "=" * 60,
+        ]
+    
+    sys.stdout.write("\n".join(lines) + "\n")
+    return 0 if passed == total else 1
 
 
 if __name__ == "__main__":
-    sys.exit(main())
+    sys.exit(main(json_output="--json" in sys.argv[1:]))